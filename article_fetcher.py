@@ -0,0 +1,236 @@
+"""
+Загрузка полного текста статей по ссылкам кандидатов
+Потоковое скачивание с лимитом байт и времени, извлечение текста без построения DOM
+"""
+import asyncio
+import codecs
+import logging
+import re
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+import httpx
+import config
+
+logger = logging.getLogger(__name__)
+
+# Теги, текст внутри которых никогда не относится к статье
+SKIP_TAGS = {'script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'button', 'svg', 'iframe'}
+
+# Теги, содержащие абзацы основного текста
+TEXT_TAGS = {'p', 'h1', 'h2', 'h3', 'li', 'blockquote'}
+
+# Контейнеры основного контента
+MAIN_TAGS = {'article', 'main'}
+
+# Теги без закрывающей пары - не влияют на глубину вложенности
+VOID_TAGS = {'br', 'img', 'hr', 'meta', 'link', 'input', 'source', 'wbr'}
+
+# Абзацы короче этого обычно подписи, кнопки и хлебные крошки
+MIN_PARAGRAPH_LENGTH = 40
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class ArticleTextParser(HTMLParser):
+    """
+    Инкрементальный парсер основного текста статьи
+
+    Данные подаются кусками через feed() по мере скачивания.
+    Собираются абзацы; если на странице есть <article>/<main>,
+    предпочтение отдается тексту внутри них.
+    """
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.main_paragraphs: List[str] = []
+        self.other_paragraphs: List[str] = []
+        self.main_chars = 0
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._text_depth = 0
+        self._buffer: List[str] = []
+
+    @property
+    def is_complete(self) -> bool:
+        """Набрано достаточно текста - дальше можно не качать"""
+        return self.main_chars >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self._main_depth += 1
+        elif tag in TEXT_TAGS:
+            if self._text_depth == 0:
+                self._buffer = []
+            self._text_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in MAIN_TAGS:
+            self._main_depth = max(0, self._main_depth - 1)
+        elif tag in TEXT_TAGS and self._text_depth:
+            self._text_depth -= 1
+            if self._text_depth == 0:
+                self._flush_paragraph()
+
+    def handle_data(self, data):
+        if self._text_depth and not self._skip_depth:
+            self._buffer.append(data)
+
+    def _flush_paragraph(self):
+        paragraph = _WHITESPACE_RE.sub(' ', ''.join(self._buffer)).strip()
+        self._buffer = []
+        if len(paragraph) < MIN_PARAGRAPH_LENGTH:
+            return
+        if self._main_depth:
+            self.main_paragraphs.append(paragraph)
+            self.main_chars += len(paragraph)
+        elif sum(len(p) for p in self.other_paragraphs) < self.max_chars:
+            self.other_paragraphs.append(paragraph)
+
+    def get_text(self) -> str:
+        """Возвращает извлеченный текст статьи"""
+        paragraphs = self.main_paragraphs or self.other_paragraphs
+        return '\n\n'.join(paragraphs)[:self.max_chars]
+
+
+class ArticleFetcher:
+    """Скачивание и извлечение полного текста статей с кэшем по URL"""
+
+    def __init__(self):
+        self.max_bytes = config.ARTICLE_MAX_BYTES
+        self.timeout = config.ARTICLE_FETCH_TIMEOUT
+        self.max_chars = config.ARTICLE_MAX_CHARS
+        self.cache_size = config.ARTICLE_CACHE_SIZE
+        self.cache_ttl = config.ARTICLE_CACHE_TTL_HOURS * 3600
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+
+    def _cache_get(self, url: str) -> Optional[str]:
+        entry = self._cache.get(url)
+        if entry is None:
+            return None
+        stored_at, text = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self._cache[url]
+            return None
+        self._cache.move_to_end(url)
+        return text
+
+    def _cache_put(self, url: str, text: str):
+        self._cache[url] = (time.monotonic(), text)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def fetch_text(self, url: str, client: Optional[httpx.AsyncClient] = None) -> str:
+        """
+        Скачивает страницу и извлекает основной текст
+
+        Загрузка прерывается при превышении лимита байт, времени
+        или когда набрано достаточно текста. Неудачи тоже кэшируются
+        (пустой строкой), чтобы не долбить недоступную страницу.
+        """
+        if not url or not url.startswith(('http://', 'https://')):
+            return ''
+
+        cached = self._cache_get(url)
+        if cached is not None:
+            return cached
+
+        try:
+            if client is None:
+                async with httpx.AsyncClient(follow_redirects=True) as own_client:
+                    text = await asyncio.wait_for(self._download(own_client, url), self.timeout)
+            else:
+                text = await asyncio.wait_for(self._download(client, url), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Статья не загрузилась за {self.timeout} с: {url}")
+            text = ''
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка загрузки статьи {url}: {e}")
+            text = ''
+
+        self._cache_put(url, text)
+        return text
+
+    async def _download(self, client: httpx.AsyncClient, url: str) -> str:
+        """Потоково скачивает страницу, скармливая куски парсеру"""
+        headers = {'User-Agent': 'Mozilla/5.0 (compatible; DreamOracleBot/2.0)'}
+        async with client.stream('GET', url, headers=headers, timeout=self.timeout) as response:
+            response.raise_for_status()
+
+            content_type = response.headers.get('content-type', '')
+            if 'html' not in content_type:
+                return ''
+
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            parser = ArticleTextParser(self.max_chars)
+            received = 0
+
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if received >= self.max_bytes or parser.is_complete:
+                    break
+
+            parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+            return parser.get_text()
+
+    async def enrich(self, candidates: List[Dict], client: Optional[httpx.AsyncClient] = None) -> List[Dict]:
+        """
+        Параллельно подгружает полный текст для кандидатов
+
+        Текст пишется в поле 'content', если он длиннее того, что уже есть.
+        Одновременно загружается не больше ARTICLE_FETCH_CONCURRENCY страниц;
+        без client создается свой клиент на все загрузки.
+        Возвращает тот же список.
+        """
+        if not candidates:
+            return candidates
+
+        if client is None:
+            async with httpx.AsyncClient(follow_redirects=True) as own_client:
+                return await self.enrich(candidates, own_client)
+
+        semaphore = asyncio.Semaphore(config.ARTICLE_FETCH_CONCURRENCY)
+
+        async def fetch_one(candidate: Dict):
+            async with semaphore:
+                text = await self.fetch_text(candidate.get('url', ''), client)
+            current = candidate.get('content') or candidate.get('description') or ''
+            if len(text) > len(current):
+                candidate['content'] = text
+
+        await asyncio.gather(*(fetch_one(candidate) for candidate in candidates))
+        return candidates
+
+
+# Тестирование модуля
+if __name__ == '__main__':
+    fixture = """
+    <html><head><title>Sleep study</title><script>var x = "<p>not text</p>";</script></head>
+    <body>
+      <nav><p>Home | News | About us and other navigation links here</p></nav>
+      <article>
+        <h1>New Study Reveals Brain Activity During Lucid Dreams</h1>
+        <p>Scientists discovered increased activity in the prefrontal cortex during lucid dreaming.</p>
+        <p>Participants who reported frequent lucid dreams showed more gray matter in frontopolar areas.</p>
+        <div class="share"><p>Share</p></div>
+      </article>
+      <footer><p>Copyright 2024 Example Media Group. All rights reserved worldwide.</p></footer>
+    </body></html>
+    """
+    parser = ArticleTextParser(max_chars=5000)
+    # Подаем документ маленькими кусками, как при потоковой загрузке
+    for start in range(0, len(fixture), 64):
+        parser.feed(fixture[start:start + 64])
+    parser.close()
+    print(parser.get_text())
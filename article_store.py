@@ -0,0 +1,234 @@
+"""
+Компактное хранилище кандидатов в памяти
+Записи на __slots__ с интернированными источником и темой, индекс по URL
+и дате публикации, вытеснение самых старых записей за O(1)
+"""
+import logging
+import random
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+
+def parse_published(value: str) -> float:
+    """Дата публикации (RFC 822 из RSS или ISO 8601 из NewsAPI/Atom) в timestamp; 0 - неизвестна"""
+    if not value:
+        return 0.0
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class Article:
+    """Кандидат на пост: та же информация, что в словаре, без словаря на каждый экземпляр"""
+
+    __slots__ = ('url', 'title', 'description', 'content', 'source', 'topic', 'published', 'added_at', 'used')
+
+    def __init__(self, url: str, title: str = '', description: str = '', content: str = '',
+                 source: str = '', topic: str = '', published: float = 0.0):
+        self.url = url
+        self.title = title
+        self.description = description
+        self.content = content
+        # Источников и тем - единицы, а записей - тысячи: храним по одной копии строки
+        self.source = sys.intern(source)
+        self.topic = sys.intern(topic)
+        self.published = published
+        self.added_at = time.time()
+        # Уже выбрана для поста - повторно из пула не отдается
+        self.used = False
+
+    @classmethod
+    def from_candidate(cls, item: Dict, topic: str = '') -> 'Article':
+        """Запись из словаря-кандидата, который возвращают источники ContentFinder"""
+        return cls(
+            url=item.get('url') or '',
+            title=item.get('title') or '',
+            description=item.get('description') or '',
+            content=item.get('content') or '',
+            source=item.get('source') or '',
+            topic=topic,
+            published=parse_published(item.get('published') or ''),
+        )
+
+    @property
+    def day(self) -> int:
+        """Номер дня (UTC) публикации, а если она неизвестна - добавления"""
+        return int((self.published or self.added_at) // SECONDS_PER_DAY)
+
+    def to_candidate(self) -> Dict:
+        """Словарь в формате кандидатов ContentFinder"""
+        return {
+            'title': self.title,
+            'description': self.description,
+            'content': self.content,
+            'url': self.url,
+            'source': self.source,
+            'published': (
+                datetime.fromtimestamp(self.published, timezone.utc).isoformat() if self.published else ''
+            ),
+        }
+
+
+class ArticleStore:
+    """
+    Ограниченный пул кандидатов
+
+    Записи лежат в OrderedDict по URL в порядке добавления, поэтому
+    самая старая вытесняется за O(1); индекс по дням позволяет быстро
+    брать свежие записи, не перебирая весь пул.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or config.ARTICLE_POOL_SIZE
+        self._by_url: 'OrderedDict[str, Article]' = OrderedDict()
+        self._by_day: Dict[int, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_url)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._by_url
+
+    def get(self, url: str) -> Optional[Article]:
+        return self._by_url.get(url)
+
+    def add(self, article: Article) -> bool:
+        """Добавляет запись; возвращает False, если URL уже в пуле (запись обновляется)"""
+        if not article.url:
+            return False
+        existing = self._by_url.get(article.url)
+        if existing is not None:
+            # Полный текст, загруженный позже, не теряем
+            if article.content and len(article.content) > len(existing.content):
+                existing.content = article.content
+            return False
+
+        self._by_url[article.url] = article
+        self._by_day.setdefault(article.day, {})[article.url] = None
+        while len(self._by_url) > self.max_size:
+            self._evict_oldest()
+        return True
+
+    def add_candidates(self, candidates: Iterable[Dict], topic: str = '') -> int:
+        """Добавляет словари-кандидаты; возвращает число новых записей"""
+        return sum(self.add(Article.from_candidate(item, topic)) for item in candidates)
+
+    def mark_used(self, url: str):
+        """Отмечает запись выбранной для поста, чтобы recent() ее больше не отдавал"""
+        article = self._by_url.get(url)
+        if article is not None:
+            article.used = True
+
+    def is_used(self, url: str) -> bool:
+        """Выбиралась ли запись с этим URL для поста"""
+        article = self._by_url.get(url)
+        return article is not None and article.used
+
+    def _evict_oldest(self):
+        url, article = self._by_url.popitem(last=False)
+        day_urls = self._by_day.get(article.day)
+        if day_urls is not None:
+            day_urls.pop(url, None)
+            if not day_urls:
+                del self._by_day[article.day]
+
+    def on_day(self, day: int) -> List[Article]:
+        """Записи, опубликованные в указанный день (номер дня UTC)"""
+        return [self._by_url[url] for url in self._by_day.get(day, ())]
+
+    def recent(self, max_age_hours: float, topic: Optional[str] = None, limit: int = 10) -> List[Article]:
+        """Случайная выборка неиспользованных записей не старше max_age_hours (опционально - по теме)"""
+        cutoff = time.time() - max_age_hours * 3600
+        first_day = int(cutoff // SECONDS_PER_DAY)
+        articles = [
+            article
+            for day in self._by_day
+            if day >= first_day
+            for article in self.on_day(day)
+            if not article.used
+            and (article.published or article.added_at) >= cutoff
+            and (topic is None or article.topic == topic)
+        ]
+        random.shuffle(articles)
+        return articles[:limit]
+
+
+# Общий пул кандидатов для всех экземпляров ContentFinder
+article_store = ArticleStore()
+
+
+# Бенчмарк памяти: словари-кандидаты против записей в пуле
+def _benchmark(count: int = 20000):
+    import tracemalloc
+
+    sources = ['ScienceDaily', 'Psychology Today', 'DuckDuckGo', 'BBC News', 'Nature']
+    topics = ['lucid dreaming', 'sleep science', 'nightmares', 'REM sleep']
+
+    def raw_items():
+        # Как из JSON/API: каждая строка - отдельный объект, даже если значение совпадает
+        for number in range(count):
+            yield {
+                'title': f"Dream study #{number}",
+                'description': f"Researchers studied dreams in cohort {number}.",
+                'content': '',
+                'url': f"https://example.com/articles/{number}",
+                'source': ''.join(sources[number % len(sources)]),
+                'published': f"2024-01-{number % 28 + 1:02d}T08:00:00Z",
+            }
+
+    def measure(build):
+        tracemalloc.start()
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, current
+
+    def as_dicts():
+        pool = {}
+        for number, item in enumerate(raw_items()):
+            item['topic'] = ''.join(topics[number % len(topics)])
+            pool[item['url']] = item
+        return pool
+
+    def as_store():
+        store = ArticleStore(max_size=count)
+        for number, item in enumerate(raw_items()):
+            store.add(Article.from_candidate(item, ''.join(topics[number % len(topics)])))
+        return store
+
+    dicts, dict_bytes = measure(as_dicts)
+    store, store_bytes = measure(as_store)
+    assert len(dicts) == len(store) == count
+
+    print(f"\n📦 Пул из {count} статей")
+    print(f"   {'словари:':14} {dict_bytes / 1048576:6.1f} МБ, {dict_bytes / count:6.0f} байт на статью")
+    print(f"   {'ArticleStore:':14} {store_bytes / 1048576:6.1f} МБ, {store_bytes / count:6.0f} байт на статью")
+    print(f"   {'экономия:':14} {(dict_bytes - store_bytes) / count:6.0f} байт на статью "
+          f"({1 - store_bytes / dict_bytes:.0%})")
+
+    started = time.perf_counter()
+    small = ArticleStore(max_size=1000)
+    for item in raw_items():
+        small.add(Article.from_candidate(item))
+    elapsed = time.perf_counter() - started
+    print(f"   вставка с вытеснением: {elapsed / count * 1e6:.1f} мкс на статью, в пуле {len(small)}")
+
+
+if __name__ == '__main__':
+    _benchmark()
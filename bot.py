@@ -5,17 +5,15 @@ Telegram бот для автоматического постинга в кан
 import asyncio
 import logging
 from datetime import datetime
+from typing import List, Optional
 from telegram import Bot
 from telegram.error import TelegramError
 import config
 from content_finder import ContentFinder
 from groq_engine import GroqEngine
+from logging_setup import correlated, setup_logging
+from post_archive import post_archive
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 
@@ -26,49 +24,145 @@ class DreamOracleBot:
         self.bot = Bot(token=config.BOT_TOKEN)
         self.content_finder = ContentFinder()
         self.groq_engine = GroqEngine()
+        self.archive = post_archive
         self.is_running = False
     
-    async def create_and_publish_post(self, custom_topic: str = None) -> bool:
+    @correlated('post')
+    async def create_and_publish_post(self, custom_topic: str = None, interactive: bool = False) -> bool:
         """
         Создает и публикует пост в канал
         
         Args:
             custom_topic: опциональная тема для поста
+            interactive: пост по команде администратора (может брать резерв квоты NewsAPI)
         
         Returns:
             True если успешно, False если ошибка
         """
+        prepared = await self.prepare_post(custom_topic, interactive)
+        if not prepared:
+            return False
+        return await self.publish_prepared(prepared)
+    
+    async def prepare_post(self, custom_topic: str = None, interactive: bool = False) -> Optional[dict]:
+        """
+        Ищет контент и генерирует пост, не публикуя его
+        
+        Args:
+            custom_topic: опциональная тема для поста
+            interactive: пост по команде администратора (может брать резерв квоты NewsAPI)
+        
+        Returns:
+            {'text': текст поста, 'content': данные контента, 'model': модель}
+            или None при ошибке
+        """
         try:
-            print("\n" + "="*60)
-            print("🚀 НАЧИНАЮ СОЗДАНИЕ ПОСТА")
-            print("="*60)
+            logger.info("🚀 НАЧИНАЮ СОЗДАНИЕ ПОСТА")
             
             # Шаг 1: Ищем контент
             logger.info("📡 ШАГ 1: Поиск контента...")
             logger.info(f"Тема поиска: {custom_topic if custom_topic else 'автоматическая'}")
             
-            content_data = await self.content_finder.find_content(topic=custom_topic)
+            content_data = await self.content_finder.find_content(topic=custom_topic, interactive=interactive)
             
             if not content_data:
                 logger.error("❌ ОШИБКА: Контент не найден!")
                 logger.error("Возможные причины: NewsAPI не работает или нет статей по теме")
-                return False
+                return None
             
             logger.info(f"✅ Контент найден: {content_data.get('title', 'без названия')}")
             logger.info(f"Источник: {content_data.get('source', 'неизвестен')}")
             
             # Шаг 2: Генерируем пост через Groq
             logger.info("🤖 ШАГ 2: Генерация поста через Groq...")
-            logger.info(f"Используется модель: {config.GROQ_MODEL}")
             
-            post_text = await self.groq_engine.generate_post(content_data)
+            post = await self.groq_engine.generate_post(content_data, interactive)
             
-            if not post_text:
+            if not post.text:
                 logger.error("❌ ОШИБКА: Groq не вернул текст поста!")
-                return False
+                return None
+            
+            # Не повторяем формулировки прошлых постов: одна повторная генерация
+            overlap = await self._phrase_overlap(post.text)
+            if overlap > config.MAX_PHRASE_OVERLAP:
+                logger.warning(f"⚠️ Пост на {overlap:.0%} повторяет фразы из архива, генерирую заново")
+                post = await self.groq_engine.generate_post(content_data, interactive)
             
-            logger.info(f"✅ Пост сгенерирован: {len(post_text)} символов")
+            logger.info(f"✅ Пост сгенерирован: {len(post.text)} символов")
+            logger.info(f"Модель: {post.model}")
+            if post.usage:
+                logger.info(
+                    f"Токены: промпт {post.usage['prompt_tokens']}, ответ {post.usage['completion_tokens']}"
+                )
             
+            return {'text': post.text, 'content': content_data, 'model': post.model}
+            
+        except Exception as e:
+            logger.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА: {e}")
+            logger.exception("Полный стек ошибки:")
+            return None
+    
+    async def prepare_posts(self, count: int) -> List[dict]:
+        """
+        Готовит сразу несколько постов для будущих слотов
+        
+        Материалы ищутся по очереди (каждый выбранный материал
+        исключается из следующих поисков), а посты генерируются
+        батчем - несколькими материалами в одном запросе к Groq.
+        
+        Args:
+            count: сколько постов подготовить
+        
+        Returns:
+            Список подготовленных постов в формате prepare_post (может быть короче count)
+        """
+        try:
+            logger.info(f"🚀 ГОТОВЛЮ ЗАПАС ИЗ {count} ПОСТОВ")
+            
+            contents = []
+            for _ in range(count):
+                content_data = await self.content_finder.find_content()
+                if not content_data:
+                    continue
+                if any(content_data['url'] == other['url'] for other in contents):
+                    logger.warning(f"⚠️ Материал уже в запасе, пропускаю: {content_data['url']}")
+                    continue
+                contents.append(content_data)
+            if not contents:
+                logger.error("❌ ОШИБКА: Контент не найден!")
+                return []
+            
+            posts = await self.groq_engine.generate_posts_batch(contents)
+            
+            prepared = []
+            for content_data, post in zip(contents, posts):
+                if post is None:
+                    continue
+                # Повторную генерацию по одному не делаем - просто не берем пост в запас
+                overlap = await self._phrase_overlap(post.text)
+                if overlap > config.MAX_PHRASE_OVERLAP:
+                    logger.warning(f"⚠️ Пост на {overlap:.0%} повторяет фразы из архива, пропускаю")
+                    continue
+                prepared.append({'text': post.text, 'content': content_data, 'model': post.model})
+            
+            logger.info(f"✅ Подготовлено постов: {len(prepared)} из {count}")
+            return prepared
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка подготовки запаса постов: {e}")
+            logger.exception("Полный стек ошибки:")
+            return []
+    
+    async def publish_prepared(self, prepared: dict) -> bool:
+        """
+        Публикует подготовленный prepare_post пост в канал
+        
+        Returns:
+            True если успешно, False если ошибка
+        """
+        post_text = prepared['text']
+        content_data = prepared['content']
+        try:
             # Шаг 3: Публикуем в канал
             logger.info("📤 ШАГ 3: Публикация в канал...")
             logger.info(f"Канал: {config.CHANNEL_ID}")
@@ -83,9 +177,17 @@ class DreamOracleBot:
             logger.info(f"✅ Пост опубликован! ID: {message.message_id}")
             logger.info(f"🔗 Ссылка: https://t.me/{config.CHANNEL_USERNAME.replace('@', '')}/{message.message_id}")
             
-            print("="*60)
-            print("✅ ПОСТ УСПЕШНО ОПУБЛИКОВАН!")
-            print("="*60)
+            await self._archive_post(
+                post_text,
+                message.message_id,
+                topic=content_data.get('topic', ''),
+                title=content_data.get('title', ''),
+                source=content_data.get('source', ''),
+                source_url=content_data.get('url', ''),
+                model=prepared.get('model')
+            )
+            
+            logger.info("✅ ПОСТ УСПЕШНО ОПУБЛИКОВАН!")
             
             return True
             
@@ -98,6 +200,7 @@ class DreamOracleBot:
             logger.exception("Полный стек ошибки:")
             return False
     
+    @correlated('custom')
     async def publish_custom_post(self, user_request: str) -> bool:
         """
         Создает и публикует пост по запросу пользователя
@@ -109,14 +212,14 @@ class DreamOracleBot:
             True если успешно
         """
         try:
-            print("\n" + "="*60)
-            print(f"🎯 СОЗДАНИЕ КАСТОМНОГО ПОСТА")
-            print(f"📝 Запрос: {user_request}")
-            print("="*60)
+            logger.info("🎯 СОЗДАНИЕ КАСТОМНОГО ПОСТА")
+            logger.info(f"📝 Запрос: {user_request}")
             
             # Генерируем пост без поиска
             logger.info("🤖 Генерация кастомного поста...")
-            post_text = await self.groq_engine.generate_custom_post(user_request)
+            post = await self.groq_engine.generate_custom_post(user_request)
+            post_text = post.text
+            logger.info(f"Модель: {post.model}")
             
             # Публикуем
             logger.info("📤 Публикация в канал...")
@@ -128,9 +231,11 @@ class DreamOracleBot:
             
             logger.info(f"✅ Кастомный пост опубликован! ID: {message.message_id}")
             
-            print("="*60)
-            print("✅ КАСТОМНЫЙ ПОСТ ОПУБЛИКОВАН!")
-            print("="*60)
+            await self._archive_post(
+                post_text, message.message_id, model=post.model, topic=user_request, source='custom'
+            )
+            
+            logger.info("✅ КАСТОМНЫЙ ПОСТ ОПУБЛИКОВАН!")
             
             return True
             
@@ -139,30 +244,50 @@ class DreamOracleBot:
             logger.exception("Полный стек ошибки кастомного поста:")
             return False
     
+    async def _phrase_overlap(self, post_text: str) -> float:
+        """Доля повторяющихся фраз с архивом (0, если архив недоступен)"""
+        try:
+            return await self.archive.phrase_overlap_async(post_text)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось проверить повторы по архиву: {e}")
+            return 0.0
+    
+    async def _archive_post(self, post_text: str, message_id: int, model: Optional[str] = None, **fields):
+        """Сохраняет опубликованный пост в архив; ошибка архива не отменяет публикацию"""
+        try:
+            await self.archive.add_post_async(
+                post_text,
+                message_id=message_id,
+                model=model or '',
+                **fields
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить пост в архив: {e}")
+    
     async def test_connection(self) -> bool:
         """Тестирует подключение к Telegram и каналу"""
         try:
-            print("\n🔍 Проверяю подключение...")
+            logger.info("🔍 Проверяю подключение...")
             
             # Проверяем бота
             bot_info = await self.bot.get_me()
-            print(f"✅ Бот подключен: @{bot_info.username}")
+            logger.info(f"✅ Бот подключен: @{bot_info.username}")
             
             # Проверяем права в канале
             chat = await self.bot.get_chat(config.CHANNEL_ID)
-            print(f"✅ Канал найден: {chat.title}")
+            logger.info(f"✅ Канал найден: {chat.title}")
             
             # Проверяем права администратора
             bot_member = await self.bot.get_chat_member(config.CHANNEL_ID, bot_info.id)
             if bot_member.status in ['administrator', 'creator']:
-                print(f"✅ Бот является администратором канала")
+                logger.info("✅ Бот является администратором канала")
             else:
-                print(f"⚠️ Внимание: бот не администратор! Статус: {bot_member.status}")
+                logger.warning(f"⚠️ Внимание: бот не администратор! Статус: {bot_member.status}")
             
             return True
             
         except TelegramError as e:
-            print(f"❌ Ошибка подключения: {e}")
+            logger.error(f"❌ Ошибка подключения: {e}")
             logger.exception("Полный стек ошибки подключения:")
             return False
 
@@ -170,16 +295,14 @@ class DreamOracleBot:
 # Основная функция для тестового запуска
 async def main():
     """Тестовый запуск системы"""
-    print("\n" + "="*60)
-    print("🌙 ОРАКУЛ СНОВ - СИСТЕМА АВТОПОСТИНГА")
-    print("="*60)
+    logger.info("🌙 ОРАКУЛ СНОВ - СИСТЕМА АВТОПОСТИНГА")
     
     # Проверяем конфигурацию
     try:
         config.validate_config()
-        print("✅ Конфигурация корректна")
+        logger.info("✅ Конфигурация корректна")
     except ValueError as e:
-        print(f"❌ Ошибка конфигурации: {e}")
+        logger.error(f"❌ Ошибка конфигурации: {e}")
         return
     
     # Создаем бота
@@ -187,18 +310,19 @@ async def main():
     
     # Тестируем подключение
     if not await bot.test_connection():
-        print("❌ Не удалось подключиться к Telegram")
+        logger.error("❌ Не удалось подключиться к Telegram")
         return
     
     # Создаем и публикуем тестовый пост
-    print("\n📝 Создаю и публикую тестовый пост...")
+    logger.info("📝 Создаю и публикую тестовый пост...")
     success = await bot.create_and_publish_post()
     
     if success:
-        print("\n✨ Тестовый запуск завершен успешно!")
+        logger.info("✨ Тестовый запуск завершен успешно!")
     else:
-        print("\n❌ Ошибка при создании поста")
+        logger.error("❌ Ошибка при создании поста")
 
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(main())
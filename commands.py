@@ -7,6 +7,11 @@ from telegram import Update
 from telegram.ext import ContextTypes
 import config
 from bot import DreamOracleBot
+from config_reload import config_reloader
+from post_archive import post_archive
+from loop_monitor import loop_monitor
+from profiler import profile_window
+from scheduler import describe_schedule
 
 # Глобальная переменная для хранения экземпляра бота
 bot_instance = None
@@ -40,15 +45,18 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 """
     
     if is_admin(user_id):
-        welcome_text += """
+        welcome_text += f"""
 🔹 `/post_now` - создать пост сейчас (случайная тема)
 🔹 `/post_custom [тема]` - создать пост на тему
 🔹 `/status` - статус системы
 🔹 `/next_post` - когда следующий пост
+🔹 `/search [запрос]` - поиск по опубликованным постам
+🔹 `/profile [секунды] [post]` - профиль процесса (с полным циклом поста)
+🔹 `/reload` - перечитать темы, фиды, промпт и расписание
 🔹 `/enable_auto` - включить автопостинг
 🔹 `/disable_auto` - выключить автопостинг
 
-⏰ **Автопостинг:** каждые {config.POST_INTERVAL_HOURS} часов
+⏰ **Автопостинг:** {describe_schedule()}
 """
     else:
         welcome_text += """
@@ -71,7 +79,8 @@ async def post_now_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         if bot_instance:
-            success = await bot_instance.create_and_publish_post()
+            # Команда администратора: ей доступен резерв квоты NewsAPI
+            success = await bot_instance.create_and_publish_post(interactive=True)
             if success:
                 await update.message.reply_text("✅ Пост успешно опубликован!")
             else:
@@ -127,9 +136,16 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📊 **СТАТУС СИСТЕМЫ**
 
 📱 Канал: {config.CHANNEL_USERNAME}
-⏰ Интервал постинга: каждые {config.POST_INTERVAL_HOURS} ч
+⏰ Расписание постинга: {describe_schedule()}
 """
     
+    if bot_instance:
+        usage = bot_instance.groq_engine.usage.today()
+        status_text += (
+            f"🧮 Токены сегодня: {usage['prompt_tokens']} + {usage['completion_tokens']} "
+            f"({usage['requests']} запросов)\n"
+        )
+    
     if scheduler_instance and scheduler_instance.is_running:
         status_text += f"🟢 Автопостинг: ВКЛЮЧЕН\n"
         next_time = scheduler_instance.get_next_run_time()
@@ -137,6 +153,17 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         status_text += "🔴 Автопостинг: ВЫКЛЮЧЕН"
     
+    if bot_instance:
+        health_lines = bot_instance.content_finder.health.summary_lines()
+        if health_lines:
+            status_text += "\n\n🩺 Источники:\n" + "\n".join(health_lines)
+        status_text += f"\n\n🧹 {bot_instance.content_finder.filter.summary()}"
+        status_text += f"\n📰 {bot_instance.content_finder.quota.summary()}"
+        status_text += f"\n♻️ {bot_instance.content_finder.cache.summary()}"
+    
+    if loop_monitor.is_running:
+        status_text += f"\n🐢 {loop_monitor.summary()}"
+    
     await update.message.reply_text(status_text)
 
 
@@ -193,3 +220,121 @@ async def disable_auto_command(update: Update, context: ContextTypes.DEFAULT_TYP
             await update.message.reply_text("✅ Автопостинг выключен")
     else:
         await update.message.reply_text("❌ Планировщик не инициализирован")
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /search [запрос] - поиск по архиву постов"""
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды")
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            "ℹ️ Использование: /search [запрос]\n"
+            "Например: /search осознанные сны"
+        )
+        return
+    
+    query = ' '.join(context.args)
+    
+    try:
+        results = await post_archive.search_async(query, limit=10)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка поиска: {str(e)}")
+        return
+    
+    if not results:
+        await update.message.reply_text(f"🔍 По запросу «{query}» ничего не найдено")
+        return
+    
+    lines = [f"🔍 Найдено по запросу «{query}»: {len(results)}\n"]
+    for post in results:
+        date = post['published_at'][:10]
+        link = post['link'] or f"#{post['id']}"
+        lines.append(f"📅 {date} {link}\n{post['snippet']}\n")
+    
+    await update.message.reply_text("\n".join(lines), disable_web_page_preview=True)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /profile [секунды] [post] - профилирование процесса"""
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды")
+        return
+    
+    args = list(context.args or [])
+    with_post = 'post' in args
+    if with_post:
+        args.remove('post')
+    
+    try:
+        seconds = int(args[0]) if args else 30
+    except ValueError:
+        await update.message.reply_text(
+            "ℹ️ Использование: /profile [секунды] [post]\n"
+            "Например: /profile 60 post"
+        )
+        return
+    seconds = max(1, min(seconds, config.PROFILE_MAX_SECONDS))
+    
+    workload = None
+    if with_post and bot_instance:
+        workload = bot_instance.create_and_publish_post
+    
+    await update.message.reply_text(
+        f"⏳ Профилирую {seconds} с" + (" с публикацией поста..." if workload else "...")
+    )
+    # Окно может длиться минуты - не держим обработчик, отчет придет отдельным сообщением
+    context.application.create_task(_send_profile(update, seconds, workload), update=update)
+
+
+async def _send_profile(update: Update, seconds: int, workload):
+    """Снимает профиль в фоне и отправляет отчет файлом"""
+    try:
+        report = await profile_window(seconds, workload)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка профилирования: {str(e)}")
+        return
+    
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    await update.message.reply_document(
+        document=report.encode('utf-8'),
+        filename=filename,
+        caption=report.split("\n")[2]
+    )
+
+
+async def reload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /reload - перечитать настройки без рестарта"""
+    user_id = update.effective_user.id
+    
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды")
+        return
+    
+    try:
+        changes = await config_reloader.reload()
+    except ValueError as e:
+        await update.message.reply_text(f"❌ Настройки не перезагружены: {str(e)}")
+        return
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка перезагрузки: {str(e)}")
+        return
+    
+    if not changes:
+        await update.message.reply_text("🔄 Настройки перечитаны, изменений нет")
+        return
+    
+    lines = ["🔄 Настройки обновлены:"]
+    for key, (old, new) in sorted(changes.items()):
+        if key == 'POST_STYLE_PROMPT':
+            lines.append(f"• {key}: промпт изменен ({len(old)} → {len(new)} символов)")
+        else:
+            lines.append(f"• {key}: {old} → {new}")
+    if scheduler_instance and scheduler_instance.is_running:
+        lines.append(f"\n📅 Следующий пост: {scheduler_instance.get_next_run_time()}")
+    await update.message.reply_text("\n".join(lines))
@@ -4,6 +4,10 @@
 import os
 from dotenv import load_dotenv
 
+# Переменные, заданные окружением процесса, важнее файла .env -
+# и при запуске (load_dotenv их не перезаписывает), и при горячей перезагрузке
+PROCESS_ENV_KEYS = frozenset(os.environ)
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -17,13 +21,53 @@ ADMIN_USER_ID = int(os.getenv('ADMIN_USER_ID', '0'))  # ID администра
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
+# Каскад моделей: "модель:бюджет_задержки_с:запросов_в_минуту:запросов_в_день", по порядку
+GROQ_MODELS = os.getenv(
+    'GROQ_MODELS',
+    f'{GROQ_MODEL}:25:30:1000,llama-3.1-8b-instant:15:30:14400'
+)
+# Целевая задержка генерации для интерактивных команд (/post_custom)
+GROQ_INTERACTIVE_LATENCY_TARGET = float(os.getenv('GROQ_INTERACTIVE_LATENCY_TARGET', '20'))
+
+# Бюджет токенов на один запрос к Groq
+PROMPT_INPUT_TOKEN_BUDGET = int(os.getenv('PROMPT_INPUT_TOKEN_BUDGET', '1200'))
+POST_MAX_OUTPUT_TOKENS = int(os.getenv('POST_MAX_OUTPUT_TOKENS', '800'))
+
+# Сколько материалов упаковывать в один запрос при батч-генерации
+GROQ_BATCH_SIZE = int(os.getenv('GROQ_BATCH_SIZE', '3'))
+
+# Параллельная генерация вариантов поста: сколько запускать (1 - выключено),
+# с какой оценки вариант считается достаточно хорошим и сколько ждать остальные
+POST_VARIANTS = int(os.getenv('POST_VARIANTS', '1'))
+POST_VARIANT_GOOD_SCORE = float(os.getenv('POST_VARIANT_GOOD_SCORE', '0.85'))
+POST_VARIANT_DEADLINE = float(os.getenv('POST_VARIANT_DEADLINE', '60'))
+
 # NewsAPI настройки
 NEWS_API_KEY = os.getenv('NEWS_API_KEY')
+# Суточная квота запросов (бесплатный план - 100), резерв под ручные посты,
+# сколько тем объединять в один OR-запрос при нехватке квоты
+NEWSAPI_DAILY_LIMIT = int(os.getenv('NEWSAPI_DAILY_LIMIT', '100'))
+NEWSAPI_RESERVE = int(os.getenv('NEWSAPI_RESERVE', '5'))
+NEWSAPI_MAX_OR_TOPICS = int(os.getenv('NEWSAPI_MAX_OR_TOPICS', '4'))
+NEWSAPI_QUOTA_FILE = os.getenv('NEWSAPI_QUOTA_FILE', 'newsapi_quota.json')
 
 # Настройки автопостинга
 AUTO_POST_ENABLED = os.getenv('AUTO_POST_ENABLED', 'true').lower() == 'true'
 POST_INTERVAL_HOURS = int(os.getenv('POST_INTERVAL_HOURS', '8'))
 
+# Публикация по слотам (время по Москве, например "09:00,17:00,01:00").
+# Если задано, пост готовится заранее (p95 длительности прошлых запусков
+# с запасом) и отправляется точно в слот; иначе - каждые POST_INTERVAL_HOURS
+POST_SLOTS = [slot.strip() for slot in os.getenv('POST_SLOTS', '').split(',') if slot.strip()]
+POST_LEAD_DEFAULT_SECONDS = float(os.getenv('POST_LEAD_DEFAULT_SECONDS', '600'))
+POST_LEAD_MIN_SECONDS = float(os.getenv('POST_LEAD_MIN_SECONDS', '60'))
+POST_LEAD_MAX_SECONDS = float(os.getenv('POST_LEAD_MAX_SECONDS', '1800'))
+POST_LEAD_MARGIN = float(os.getenv('POST_LEAD_MARGIN', '1.5'))
+# Запас готовых постов для слотов: сколько постов готовить за раз батч-генерацией
+# (1 - выключено, каждый пост готовится отдельно) и сколько часов готовый пост годен
+POST_PREFETCH_COUNT = int(os.getenv('POST_PREFETCH_COUNT', '1'))
+POST_PREFETCH_MAX_AGE_HOURS = float(os.getenv('POST_PREFETCH_MAX_AGE_HOURS', '24'))
+
 # Темы для поиска
 SEARCH_TOPICS = os.getenv('SEARCH_TOPICS', '').split(',')
 SEARCH_TOPICS = [topic.strip() for topic in SEARCH_TOPICS if topic.strip()]
@@ -31,21 +75,119 @@ SEARCH_TOPICS = [topic.strip() for topic in SEARCH_TOPICS if topic.strip()]
 # Язык контента
 CONTENT_LANGUAGE = os.getenv('CONTENT_LANGUAGE', 'ru')
 
-# RSS фиды научных источников
-RSS_FEEDS = [
+# RSS фиды научных источников (можно переопределить списком через запятую)
+RSS_FEEDS = [feed.strip() for feed in os.getenv('RSS_FEEDS', '').split(',') if feed.strip()] or [
     'https://www.sciencedaily.com/rss/mind_brain/sleep.xml',
     'https://www.sciencedaily.com/rss/mind_brain/dreams.xml',
     'http://feeds.feedburner.com/PsychologyToday/blog/dream-factory',
 ]
 
+# Реестр фидов и фоновый обход
+FEEDS_FILE = os.getenv('FEEDS_FILE', 'feeds.txt')  # дополнительные фиды, по одному URL в строке
+FEED_STATE_FILE = os.getenv('FEED_STATE_FILE', 'feed_state.json')
+FEED_CRAWLER_ENABLED = os.getenv('FEED_CRAWLER_ENABLED', 'true').lower() == 'true'
+FEED_CRAWL_TICK = int(os.getenv('FEED_CRAWL_TICK', '30'))
+FEED_CRAWL_BATCH = int(os.getenv('FEED_CRAWL_BATCH', '20'))
+FEED_CRAWL_ENTRIES = int(os.getenv('FEED_CRAWL_ENTRIES', '10'))
+FEED_PER_HOST_CONCURRENCY = int(os.getenv('FEED_PER_HOST_CONCURRENCY', '1'))
+FEED_DEFAULT_INTERVAL = int(os.getenv('FEED_DEFAULT_INTERVAL', '3600'))
+FEED_MIN_INTERVAL = int(os.getenv('FEED_MIN_INTERVAL', '900'))
+FEED_MAX_INTERVAL = int(os.getenv('FEED_MAX_INTERVAL', str(24 * 3600)))
+FEED_FRESH_HOURS = int(os.getenv('FEED_FRESH_HOURS', '72'))
+# Состояние реестра пишется на диск не чаще раза в столько секунд и только при изменениях
+FEED_STATE_SAVE_INTERVAL = int(os.getenv('FEED_STATE_SAVE_INTERVAL', '300'))
+# Описания записей в кэше фидов обрезаются до этой длины (полный текст качает ArticleFetcher)
+FEED_SUMMARY_MAX_CHARS = int(os.getenv('FEED_SUMMARY_MAX_CHARS', '600'))
+
+# Загрузка RSS-фидов
+FEED_FETCH_TIMEOUT = float(os.getenv('FEED_FETCH_TIMEOUT', '10'))
+# Общий лимит на загрузку фида фоновым обходом (FEED_FETCH_TIMEOUT - лимит на одно чтение)
+FEED_FETCH_DEADLINE = float(os.getenv('FEED_FETCH_DEADLINE', '30'))
+FEED_MAX_BYTES = int(os.getenv('FEED_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# Кэш результатов NewsAPI и DuckDuckGo: свежесть, окно отдачи устаревшего с обновлением в фоне
+SOURCE_CACHE_FILE = os.getenv('SOURCE_CACHE_FILE', 'source_cache.json')
+SOURCE_CACHE_TTL = int(os.getenv('SOURCE_CACHE_TTL', '1800'))
+SOURCE_CACHE_STALE = int(os.getenv('SOURCE_CACHE_STALE', str(6 * 3600)))
+SOURCE_CACHE_MAX_ENTRIES = int(os.getenv('SOURCE_CACHE_MAX_ENTRIES', '200'))
+
+# Ограничение времени поиска контента
+SEARCH_DEADLINE_SECONDS = float(os.getenv('SEARCH_DEADLINE_SECONDS', '20'))
+SEARCH_ENOUGH_CANDIDATES = int(os.getenv('SEARCH_ENOUGH_CANDIDATES', '8'))
+SEARCH_HEDGE_ENABLED = os.getenv('SEARCH_HEDGE_ENABLED', 'false').lower() == 'true'
+SEARCH_HEDGE_DELAY = float(os.getenv('SEARCH_HEDGE_DELAY', '5'))
+# Лимит одного запроса к NewsAPI или DuckDuckGo (синхронные клиенты работают в потоке)
+SEARCH_SOURCE_TIMEOUT = float(os.getenv('SEARCH_SOURCE_TIMEOUT', '15'))
+
+# Локальный фильтр кандидатов перед выбором материала
+FILTER_MIN_CHARS = int(os.getenv('FILTER_MIN_CHARS', '80'))
+FILTER_LANGUAGES = [lang.strip() for lang in os.getenv('FILTER_LANGUAGES', 'en,ru').split(',') if lang.strip()]
+# Основы ключевых слов (пустой список - проверка темы выключена)
+FILTER_KEYWORDS = [word.strip().lower() for word in os.getenv(
+    'FILTER_KEYWORDS',
+    'dream,sleep,nightmare,lucid,insomnia,circadian,rem sleep,melatonin,'
+    'сон,сны,снов,сновид,кошмар,бессон,осознанн'
+).split(',') if word.strip()]
+FILTER_DOMAIN_DENY = [domain.strip().lower() for domain in os.getenv(
+    'FILTER_DOMAIN_DENY',
+    'youtube.com,pinterest.com,facebook.com,instagram.com,tiktok.com,twitter.com,x.com,amazon.com'
+).split(',') if domain.strip()]
+# Если список задан, принимаются только эти домены
+FILTER_DOMAIN_ALLOW = [domain.strip().lower() for domain in os.getenv('FILTER_DOMAIN_ALLOW', '').split(',') if domain.strip()]
+
+# Загрузка полного текста статей
+ARTICLE_FETCH_TOP_N = int(os.getenv('ARTICLE_FETCH_TOP_N', '3'))
+ARTICLE_FETCH_CONCURRENCY = int(os.getenv('ARTICLE_FETCH_CONCURRENCY', '3'))
+ARTICLE_FETCH_TIMEOUT = float(os.getenv('ARTICLE_FETCH_TIMEOUT', '8'))
+ARTICLE_MAX_BYTES = int(os.getenv('ARTICLE_MAX_BYTES', '524288'))
+ARTICLE_MAX_CHARS = int(os.getenv('ARTICLE_MAX_CHARS', '12000'))
+ARTICLE_CACHE_SIZE = int(os.getenv('ARTICLE_CACHE_SIZE', '500'))
+ARTICLE_CACHE_TTL_HOURS = int(os.getenv('ARTICLE_CACHE_TTL_HOURS', '24'))
+# Сколько прошедших фильтр кандидатов держать в памяти (запас на случай пустых источников)
+ARTICLE_POOL_SIZE = int(os.getenv('ARTICLE_POOL_SIZE', '5000'))
+
+# Circuit breaker для источников контента
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', '600'))
+CIRCUIT_MAX_OPEN_SECONDS = int(os.getenv('CIRCUIT_MAX_OPEN_SECONDS', '21600'))
+
+# Архив опубликованных постов
+ARCHIVE_DB = os.getenv('ARCHIVE_DB', 'posts.db')
+# Порог повтора фраз с прошлыми постами, выше которого пост генерируется заново
+MAX_PHRASE_OVERLAP = float(os.getenv('MAX_PHRASE_OVERLAP', '0.3'))
+
+# Сторож event loop: как часто мерить задержку и с какой задержки считать loop заблокированным
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.3'))
+
+# Профилирование по запросу (/profile)
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '300'))
+
+# Логирование
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()  # text или json
+LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size').lower()  # size или time
+LOG_ROTATION_WHEN = os.getenv('LOG_ROTATION_WHEN', 'midnight')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
 # Стиль генерации постов
-POST_STYLE_PROMPT = """
+POST_STYLE_PROMPT = os.getenv('POST_STYLE_PROMPT') or """
 Ты - Оракул Снов, мистический гид в мире сновидений. 
 Твой стиль: сочетание научных фактов с эзотерической мудростью.
 Используй эмодзи, создавай атмосферу тайны, но опирайся на реальные исследования.
 Пиши на русском языке, делай посты интересными и вовлекающими.
 """
 
+# Горячая перезагрузка темы, фидов, промпта и расписания без рестарта:
+# файл с настройками, слежение за изменениями и период проверки
+CONFIG_RELOAD_FILE = os.getenv('CONFIG_RELOAD_FILE', '.env')
+CONFIG_WATCH_ENABLED = os.getenv('CONFIG_WATCH_ENABLED', 'true').lower() == 'true'
+CONFIG_WATCH_INTERVAL = float(os.getenv('CONFIG_WATCH_INTERVAL', '5'))
+
 # Проверка наличия всех необходимых ключей
 def validate_config():
     """Проверяет наличие всех необходимых настроек"""
@@ -60,6 +202,14 @@ def validate_config():
     if missing:
         raise ValueError(f"Отсутствуют обязательные переменные: {', '.join(missing)}")
     
+    for slot in POST_SLOTS:
+        hours, _, minutes = slot.partition(':')
+        if not (hours.isdigit() and minutes.isdigit() and int(hours) < 24 and int(minutes) < 60):
+            raise ValueError(f"Некорректный слот публикации: {slot} (нужно ЧЧ:ММ)")
+
+    if not any(item.split(':')[0].strip() for item in GROQ_MODELS.split(',')):
+        raise ValueError("GROQ_MODELS не содержит ни одной модели")
+
     return True
 
 if __name__ == '__main__':
@@ -68,7 +218,10 @@ if __name__ == '__main__':
         print("✅ Конфигурация корректна!")
         print(f"📱 Канал: {CHANNEL_USERNAME}")
         print(f"🤖 Автопостинг: {'Включен' if AUTO_POST_ENABLED else 'Выключен'}")
-        print(f"⏰ Интервал: каждые {POST_INTERVAL_HOURS} часов")
+        if POST_SLOTS:
+            print(f"⏰ Слоты публикации: {', '.join(POST_SLOTS)} (МСК)")
+        else:
+            print(f"⏰ Интервал: каждые {POST_INTERVAL_HOURS} часов")
         print(f"🔍 Темы поиска: {len(SEARCH_TOPICS)}")
     except ValueError as e:
         print(f"❌ Ошибка конфигурации: {e}")
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Горячая перезагрузка настроек без рестарта
+Темы поиска, RSS-фиды, промпт стиля и расписание перечитываются
+из файла настроек по команде /reload или при его изменении
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import dotenv_values
+import config
+from feed_crawler import feed_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_list(value: str) -> list:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _parse_interval(value: str) -> int:
+    hours = int(value)
+    if hours <= 0:
+        raise ValueError(f"POST_INTERVAL_HOURS должен быть положительным: {value}")
+    return hours
+
+
+def _parse_slots(value: str) -> list:
+    slots = _parse_list(value)
+    for slot in slots:
+        hours, _, minutes = slot.partition(':')
+        if not (hours.isdigit() and minutes.isdigit() and int(hours) < 24 and int(minutes) < 60):
+            raise ValueError(f"Некорректный слот публикации: {slot} (нужно ЧЧ:ММ)")
+    return slots
+
+
+def _parse_prompt(value: str) -> str:
+    if not value.strip():
+        raise ValueError("POST_STYLE_PROMPT не может быть пустым")
+    return value
+
+
+# Настройки, которые можно менять на лету, и их разбор
+RELOADABLE: Dict[str, Callable[[str], Any]] = {
+    'SEARCH_TOPICS': _parse_list,
+    'RSS_FEEDS': _parse_list,
+    'POST_STYLE_PROMPT': _parse_prompt,
+    'POST_INTERVAL_HOURS': _parse_interval,
+    'POST_SLOTS': _parse_slots,
+}
+
+# Изменение этих настроек требует перестроить задачу 'auto_post'
+SCHEDULE_KEYS = {'POST_INTERVAL_HOURS', 'POST_SLOTS'}
+
+
+def read_settings(path: str) -> Dict[str, Any]:
+    """
+    Читает и проверяет перезагружаемые настройки из файла
+
+    Ключи, которых нет в файле, не меняются. Ключи, заданные окружением
+    процесса, тоже: как и при запуске, окружение важнее файла. Любая
+    ошибка разбора отменяет перезагрузку целиком.
+
+    Raises:
+        ValueError: если значение некорректно
+    """
+    values = dotenv_values(path)
+    settings = {}
+    for key, parse in RELOADABLE.items():
+        if key in config.PROCESS_ENV_KEYS:
+            continue
+        if values.get(key) is not None:
+            try:
+                settings[key] = parse(values[key])
+            except ValueError as e:
+                raise ValueError(f"{key}: {e}") from e
+    return settings
+
+
+def apply_settings(settings: Dict[str, Any]) -> Dict[str, Tuple[Any, Any]]:
+    """
+    Подменяет значения в модуле config
+
+    Все присваивания выполняются подряд без await, поэтому корутины
+    видят либо старый, либо новый набор целиком. ContentFinder,
+    GroqEngine и PostScheduler читают config при каждом использовании
+    и подхватывают новые значения без пересоздания (кэши и соединения
+    сохраняются).
+
+    Returns:
+        {ключ: (старое значение, новое значение)} для изменившихся ключей
+    """
+    changes = {
+        key: (getattr(config, key), value)
+        for key, value in settings.items()
+        if getattr(config, key) != value
+    }
+    for key, (_, value) in changes.items():
+        setattr(config, key, value)
+    return changes
+
+
+class ConfigReloader:
+    """Перезагрузка по команде и фоновое слежение за файлом настроек"""
+
+    def __init__(self):
+        self.scheduler = None
+        self.task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._mtimes: Dict[str, float] = {}
+
+    def attach(self, scheduler):
+        """Планировщик, чью задачу 'auto_post' нужно перестраивать"""
+        self.scheduler = scheduler
+
+    def _watched_files(self) -> list:
+        return [path for path in (config.CONFIG_RELOAD_FILE, config.FEEDS_FILE) if path]
+
+    def _snapshot_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for path in self._watched_files():
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = 0.0
+        return mtimes
+
+    async def reload(self) -> Dict[str, Tuple[Any, Any]]:
+        """
+        Перечитывает настройки и применяет изменения
+
+        Returns:
+            {ключ: (старое значение, новое значение)}
+
+        Raises:
+            ValueError: если файл содержит некорректные значения (ничего не меняется)
+        """
+        async with self._lock:
+            self._mtimes = await asyncio.to_thread(self._snapshot_mtimes)
+            settings = await asyncio.to_thread(read_settings, config.CONFIG_RELOAD_FILE)
+            changes = apply_settings(settings)
+
+            # Список фидов мог поменяться и в FEEDS_FILE - реестр сверяем всегда
+            if feed_registry.loaded:
+                await feed_registry.load_async()
+
+            if SCHEDULE_KEYS & changes.keys() and self.scheduler is not None:
+                self.scheduler.reschedule()
+
+            if changes:
+                logger.info(f"🔄 Настройки перезагружены: {', '.join(sorted(changes))}")
+            else:
+                logger.info("🔄 Настройки перечитаны, изменений нет")
+            return changes
+
+    def start(self):
+        """Запускает слежение за файлами настроек (нужен работающий event loop)"""
+        if self.task is not None and not self.task.done():
+            return
+        self._mtimes = self._snapshot_mtimes()
+        self.task = asyncio.get_running_loop().create_task(self._watch())
+        logger.info(f"✅ Слежение за настройками запущено: {', '.join(self._watched_files())}")
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(config.CONFIG_WATCH_INTERVAL)
+            try:
+                if await asyncio.to_thread(self._snapshot_mtimes) != self._mtimes:
+                    await self.reload()
+            except ValueError as e:
+                logger.error(f"❌ Настройки не перезагружены: {e}")
+            except Exception as e:
+                logger.error(f"❌ Ошибка слежения за настройками: {e}", exc_info=True)
+
+
+# Общий перезагрузчик для процесса
+config_reloader = ConfigReloader()
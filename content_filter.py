@@ -0,0 +1,206 @@
+"""
+Быстрый локальный фильтр кандидатов перед выбором материала
+Отсеивает пустые, платные, нетематические и чужеязычные материалы,
+чтобы не тратить на них запросы к Groq
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Pattern
+from urllib.parse import urlparse
+import config
+
+logger = logging.getLogger(__name__)
+
+# Хвост обрезанного контента NewsAPI: "... [+1234 chars]"
+TRUNCATION_MARKER_RE = re.compile(r'\s*…?\s*\[\+\d+ chars\]\s*$')
+
+# Заглушки пейволлов и служебные страницы вместо статьи
+BOILERPLATE_RE = re.compile(
+    r'subscribe to (continue|read)|subscribers only|for subscribers|sign in to (continue|read)'
+    r'|create a free account|enable javascript|access denied|page not found|404 not found'
+    r'|accept (all )?cookies|are you a robot|подпишитесь, чтобы|доступно только подписчикам',
+    re.IGNORECASE
+)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Слова темы короче этого не используются как ключевые
+MIN_TOPIC_WORD_LENGTH = 4
+
+
+def detect_script_language(text: str) -> str:
+    """
+    Грубое определение языка по алфавиту: 'ru', 'en' или 'other'
+
+    Для отбора кандидатов этого достаточно: источники - английские
+    и русские, все остальное генерации не подходит.
+    """
+    cyrillic = latin = other = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        lower = char.lower()
+        if 'а' <= lower <= 'я' or lower == 'ё':
+            cyrillic += 1
+        elif 'a' <= lower <= 'z':
+            latin += 1
+        else:
+            other += 1
+    total = cyrillic + latin + other
+    if not total:
+        return 'other'
+    if cyrillic / total > 0.5:
+        return 'ru'
+    if latin / total > 0.5:
+        return 'en'
+    return 'other'
+
+
+def _domain_matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def keywords_pattern(keywords: Iterable[str]) -> Optional[Pattern]:
+    """
+    Регулярка для основ ключевых слов: совпадение только с начала слова
+
+    Основа "сон" находит "сон" и "сонный", но не "персона"; None - проверка выключена.
+    """
+    keywords = sorted(set(keywords), key=len, reverse=True)
+    if not keywords:
+        return None
+    return re.compile(r'(?<!\w)(?:' + '|'.join(re.escape(keyword) for keyword in keywords) + ')')
+
+
+class FilterPass:
+    """
+    Один прогон фильтра по кандидатам, которые приходят частями
+
+    Кандидаты проверяются по мере поступления (feed), поэтому поиск
+    может считать только прошедших фильтр; статистика фильтра
+    обновляется один раз за прогон (finish).
+    """
+
+    def __init__(self, owner: 'ContentFilter', keywords: Optional[Pattern]):
+        self.owner = owner
+        self.keywords = keywords
+        self.checked = 0
+        self.accepted: List[Dict] = []
+        self.rejected = Counter()
+
+    def feed(self, candidates: List[Dict]) -> List[Dict]:
+        """Проверяет очередную часть кандидатов; возвращает прошедших"""
+        accepted = []
+        for item in candidates:
+            reason = self.owner.check(item, self.keywords)
+            if reason:
+                self.rejected[reason] += 1
+            else:
+                accepted.append(item)
+        self.checked += len(candidates)
+        self.accepted.extend(accepted)
+        return accepted
+
+    def finish(self) -> List[Dict]:
+        """Учитывает прогон в статистике фильтра; возвращает всех прошедших"""
+        self.owner.record(self.checked, len(self.accepted), self.rejected)
+        return self.accepted
+
+
+class ContentFilter:
+    """
+    Цепочка дешевых проверок кандидата
+
+    Проверки идут от дешевых к более дорогим; первая сработавшая
+    определяет причину отказа. Статистика копится между запусками
+    и показывается в /status.
+    """
+
+    def __init__(self):
+        self.rejections = Counter()
+        self.checked = 0
+        self.passed = 0
+        # Ожидаемое число сэкономленных вызовов Groq: при случайном выборе
+        # доля мусора среди кандидатов - вероятность сгенерировать пост по мусору
+        self.saved_calls = 0.0
+
+    def check(self, item: Dict, keywords: Optional[Pattern]) -> Optional[str]:
+        """
+        Проверяет кандидата
+
+        Args:
+            item: словарь-кандидат
+            keywords: регулярка ключевых слов (keywords_pattern) или None
+
+        Returns:
+            None, если кандидат подходит, иначе код причины отказа
+        """
+        host = urlparse(item.get('url') or '').netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        if host and _domain_matches(host, config.FILTER_DOMAIN_DENY):
+            return 'domain_denied'
+        if config.FILTER_DOMAIN_ALLOW and not _domain_matches(host, config.FILTER_DOMAIN_ALLOW):
+            return 'domain_not_allowed'
+
+        # Обрезанный контент NewsAPI - не статья; полный текст подтянет ArticleFetcher
+        content = item.get('content') or ''
+        if TRUNCATION_MARKER_RE.search(content):
+            item['content'] = ''
+            content = ''
+
+        text = ' '.join(part for part in (item.get('title'), item.get('description'), content) if part)
+        if len(text) < config.FILTER_MIN_CHARS:
+            return 'too_short'
+        if BOILERPLATE_RE.search(text):
+            return 'paywall'
+        if detect_script_language(text) not in config.FILTER_LANGUAGES:
+            return 'language'
+
+        if keywords is not None and not keywords.search(text.lower()):
+            return 'off_topic'
+        return None
+
+    def start(self, topic: str = '') -> FilterPass:
+        """Начинает прогон фильтра для поиска по теме"""
+        keywords = list(config.FILTER_KEYWORDS)
+        if keywords:
+            # Явно заданная тема тоже считается тематичной
+            keywords += [word.lower() for word in _WORD_RE.findall(topic) if len(word) >= MIN_TOPIC_WORD_LENGTH]
+        return FilterPass(self, keywords_pattern(keywords))
+
+    def apply(self, candidates: List[Dict], topic: str = '') -> List[Dict]:
+        """Оставляет подходящих кандидатов и обновляет статистику"""
+        filter_pass = self.start(topic)
+        filter_pass.feed(candidates)
+        return filter_pass.finish()
+
+    def record(self, checked: int, passed: int, rejected: Counter):
+        """Учитывает завершенный прогон в статистике"""
+        self.checked += checked
+        self.passed += passed
+        self.rejections.update(rejected)
+        if checked:
+            self.saved_calls += sum(rejected.values()) / checked
+
+        if rejected:
+            logger.info(
+                f"🧹 Фильтр: {passed} из {checked} кандидатов, отсеяно: "
+                + ', '.join(f"{reason} {count}" for reason, count in rejected.most_common())
+            )
+
+    def summary(self) -> str:
+        """Одна строка статистики для /status"""
+        if not self.checked:
+            return 'Фильтр: кандидатов еще не было'
+        reasons = ', '.join(f"{reason} {count}" for reason, count in self.rejections.most_common())
+        return (
+            f"Фильтр: проверено {self.checked}, прошло {self.passed}"
+            + (f" (отсеяно: {reasons})" if reasons else '')
+            + f", сэкономлено ~{self.saved_calls:.1f} вызовов Groq"
+        )
+
+
+# Общий фильтр для всех экземпляров ContentFinder
+content_filter = ContentFilter()
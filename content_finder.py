@@ -3,39 +3,89 @@
 Использует: NewsAPI, DuckDuckGo, RSS-фиды
 """
 import asyncio
+import logging
 import random
-from typing import List, Dict, Optional
-import feedparser
+import time
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from newsapi import NewsApiClient
 from duckduckgo_search import DDGS
 import config
+from article_fetcher import ArticleFetcher
+from article_store import article_store
+from content_filter import content_filter
+from feed_crawler import feed_crawler, feed_registry
+from feed_parser import fetch_feed
+from logging_setup import setup_logging
+from news_quota import newsapi_quota
+from result_cache import source_cache
+from source_health import CLOSED, health_registry
+
+logger = logging.getLogger(__name__)
+
+# Текст короче этого считаем тизером, а не полной статьей
+FULL_TEXT_MIN_CHARS = 500
+
+# Источники за кэшем результатов. Их запрос под asyncio.shield переживает
+# дедлайн поиска и сам записывает исход в health. Дубли им не нужны: дубль
+# присоединился бы к тому же запросу в полете, а для NewsAPI еще и тратил бы квоту
+CACHED_SOURCES = ('NewsAPI', 'DuckDuckGo')
 
 class ContentFinder:
     """Класс для поиска контента о снах и сновидениях"""
     
     def __init__(self):
+        self.article_fetcher = ArticleFetcher()
+        self.health = health_registry
+        self.filter = content_filter
+        self.quota = newsapi_quota
+        self.cache = source_cache
+        self.store = article_store
         self.news_api = None
         if config.NEWS_API_KEY:
             try:
                 self.news_api = NewsApiClient(api_key=config.NEWS_API_KEY)
             except Exception as e:
-                print(f"⚠️ NewsAPI недоступен: {e}")
+                logger.warning(f"⚠️ NewsAPI недоступен: {e}")
+    
+    async def search_news_api(self, query: str, max_results: int = 3, interactive: bool = False) -> List[Dict]:
+        """Поиск через NewsAPI (через кэш результатов)"""
+        return await self.cache.get_or_fetch(
+            'NewsAPI', query, {'max_results': max_results},
+            lambda: self._fetch_news_api(query, max_results, interactive)
+        )
     
-    async def search_news_api(self, query: str, max_results: int = 3) -> List[Dict]:
-        """Поиск через NewsAPI"""
-        if not self.news_api:
+    async def _fetch_news_api(self, query: str, max_results: int, interactive: bool) -> List[Dict]:
+        """Запрос к NewsAPI (в пределах суточной квоты)"""
+        if not self.news_api or not self.health.allow('NewsAPI'):
             return []
         
+        planned_query, topics = self.quota.plan(query, interactive)
+        if not planned_query:
+            logger.info(f"⏭️ NewsAPI пропущен: бережем квоту ({self.quota.summary()})")
+            return []
+        # Объединенный запрос покрывает несколько тем - берем больше статей за тот же запрос
+        params = {'max_results': max_results}
+        max_results *= len(topics)
+        
+        started = time.monotonic()
         try:
-            print(f"🔍 Ищу в NewsAPI: {query}")
-            
-            # Поиск статей
-            response = self.news_api.get_everything(
-                q=query,
-                language='en',
-                sort_by='publishedAt',
-                page_size=max_results
+            logger.info(f"🔍 Ищу в NewsAPI: {planned_query}")
+            
+            self.quota.consume()
+            await asyncio.to_thread(self.quota.save)
+            # Поиск статей (синхронный клиент - в отдельном потоке, чтобы не блокировать цикл)
+            response = await asyncio.wait_for(
+                asyncio.to_thread(
+                    self.news_api.get_everything,
+                    q=planned_query,
+                    language='en',
+                    sort_by='publishedAt',
+                    page_size=max_results
+                ),
+                timeout=config.SEARCH_SOURCE_TIMEOUT
             )
+            if response.get('status') == 'error':
+                raise RuntimeError(f"{response.get('code', '')}: {response.get('message', 'NewsAPI error')}")
             
             articles = []
             for article in response.get('articles', [])[:max_results]:
@@ -48,72 +98,239 @@ class ContentFinder:
                     'published': article.get('publishedAt', '')
                 })
             
-            print(f"✅ NewsAPI: найдено {len(articles)} статей")
+            self.health.record_success('NewsAPI', time.monotonic() - started)
+            logger.info(f"✅ NewsAPI: найдено {len(articles)} статей")
+            # Ответ на объединенный запрос годится и для остальных тем: следующий
+            # поиск по ним возьмет его из кэша, не тратя квоту
+            for other in topics[1:]:
+                self.cache.put('NewsAPI', other, params, articles)
             return articles
             
+        except asyncio.TimeoutError:
+            self.health.record_failure('NewsAPI', time.monotonic() - started, 'timeout')
+            logger.error(f"❌ NewsAPI не ответил за {config.SEARCH_SOURCE_TIMEOUT:.0f} с")
+            return []
         except Exception as e:
-            print(f"❌ Ошибка NewsAPI: {e}")
+            # Клиент newsapi бросает NewsAPIException с кодом ошибки в тексте
+            if 'rateLimited' in str(e) and not self.quota.exhausted:
+                self.quota.mark_exhausted()
+                await asyncio.to_thread(self.quota.save)
+            self.health.record_failure('NewsAPI', time.monotonic() - started, str(e))
+            logger.error(f"❌ Ошибка NewsAPI: {e}")
             return []
     
     async def search_duckduckgo(self, query: str, max_results: int = 5) -> List[Dict]:
-        """Поиск через DuckDuckGo"""
+        """Поиск через DuckDuckGo (через кэш результатов)"""
+        return await self.cache.get_or_fetch(
+            'DuckDuckGo', query, {'max_results': max_results},
+            lambda: self._fetch_duckduckgo(query, max_results)
+        )
+    
+    async def _fetch_duckduckgo(self, query: str, max_results: int) -> List[Dict]:
+        """Запрос к DuckDuckGo"""
+        if not self.health.allow('DuckDuckGo'):
+            return []
+        
+        started = time.monotonic()
         try:
-            print(f"🔍 Ищу в DuckDuckGo: {query}")
+            logger.info(f"🔍 Ищу в DuckDuckGo: {query}")
+            
+            search_results = await asyncio.wait_for(
+                asyncio.to_thread(self._ddg_text, query, max_results),
+                timeout=config.SEARCH_SOURCE_TIMEOUT
+            )
             
             results = []
-            with DDGS() as ddgs:
-                search_results = ddgs.text(query, max_results=max_results)
-                
-                for result in search_results:
-                    results.append({
-                        'title': result.get('title', ''),
-                        'description': result.get('body', ''),
-                        'url': result.get('href', ''),
-                        'source': 'DuckDuckGo'
-                    })
-            
-            print(f"✅ DuckDuckGo: найдено {len(results)} результатов")
+            for result in search_results:
+                results.append({
+                    'title': result.get('title', ''),
+                    'description': result.get('body', ''),
+                    'url': result.get('href', ''),
+                    'source': 'DuckDuckGo'
+                })
+            
+            self.health.record_success('DuckDuckGo', time.monotonic() - started)
+            logger.info(f"✅ DuckDuckGo: найдено {len(results)} результатов")
             return results
             
+        except asyncio.TimeoutError:
+            self.health.record_failure('DuckDuckGo', time.monotonic() - started, 'timeout')
+            logger.error(f"❌ DuckDuckGo не ответил за {config.SEARCH_SOURCE_TIMEOUT:.0f} с")
+            return []
         except Exception as e:
-            print(f"❌ Ошибка DuckDuckGo: {e}")
+            self.health.record_failure('DuckDuckGo', time.monotonic() - started, str(e))
+            logger.error(f"❌ Ошибка DuckDuckGo: {e}")
             return []
     
+    @staticmethod
+    def _ddg_text(query: str, max_results: int) -> List[Dict]:
+        """Синхронный запрос к DuckDuckGo (выполняется в отдельном потоке)"""
+        # Таймаут клиента не дает потоку висеть дольше, чем его ждет wait_for
+        with DDGS(timeout=int(config.SEARCH_SOURCE_TIMEOUT)) as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+    
     async def parse_rss_feeds(self, max_per_feed: int = 2) -> List[Dict]:
         """Парсинг RSS-фидов"""
         try:
-            print(f"🔍 Парсю RSS-фиды: {len(config.RSS_FEEDS)} источников")
-            
-            all_articles = []
-            
-            for feed_url in config.RSS_FEEDS:
-                try:
-                    feed = feedparser.parse(feed_url)
-                    
-                    for entry in feed.entries[:max_per_feed]:
-                        all_articles.append({
-                            'title': entry.get('title', ''),
-                            'description': entry.get('summary', ''),
-                            'url': entry.get('link', ''),
-                            'source': feed.feed.get('title', 'RSS Feed'),
-                            'published': entry.get('published', '')
-                        })
-                    
-                except Exception as e:
-                    print(f"⚠️ Ошибка парсинга {feed_url}: {e}")
-                    continue
-            
-            print(f"✅ RSS: найдено {len(all_articles)} статей")
+            logger.info(f"🔍 Парсю RSS-фиды: {len(config.RSS_FEEDS)} источников")
+            
+            # Фиды независимы - парсим их параллельно
+            results = await asyncio.gather(
+                *(self._parse_feed(feed_url, max_per_feed) for feed_url in config.RSS_FEEDS)
+            )
+            all_articles = [article for articles in results for article in articles]
+            
+            logger.info(f"✅ RSS: найдено {len(all_articles)} статей")
             return all_articles
             
         except Exception as e:
-            print(f"❌ Ошибка RSS: {e}")
+            logger.error(f"❌ Ошибка RSS: {e}")
+            return []
+    
+    async def cached_rss_articles(self, limit: int = 6) -> List[Dict]:
+        """Свежие записи из реестра фидов, собранные фоновым обходом"""
+        articles = feed_registry.recent_articles(config.FEED_FRESH_HOURS, limit)
+        logger.info(f"✅ RSS-кэш: {len(articles)} свежих статей")
+        return articles
+    
+    async def _parse_feed(self, feed_url: str, max_per_feed: int) -> List[Dict]:
+        """Парсинг одного RSS-фида"""
+        if not self.health.allow(feed_url):
+            return []
+        
+        started = time.monotonic()
+        try:
+            # Потоковый разбор: загрузка прекращается после max_per_feed записей
+            feed_title, entries = await fetch_feed(feed_url, max_per_feed)
+            
+            articles = []
+            for entry in entries:
+                articles.append({
+                    'title': entry.get('title', ''),
+                    'description': entry.get('summary', ''),
+                    'url': entry.get('link', ''),
+                    'source': feed_title or 'RSS Feed',
+                    'published': entry.get('published', '')
+                })
+            
+            self.health.record_success(feed_url, time.monotonic() - started)
+            return articles
+            
+        except Exception as e:
+            self.health.record_failure(feed_url, time.monotonic() - started, str(e))
+            logger.warning(f"⚠️ Ошибка парсинга {feed_url}: {e}")
+            return []
+    
+    async def _gather_sources(self, sources: List[Tuple[str, Callable[[], Awaitable[List[Dict]]]]],
+                              accept: Optional[Callable[[List[Dict]], List[Dict]]] = None) -> List[Dict]:
+        """
+        Опрашивает источники параллельно с общим дедлайном
+        
+        Результаты забираются по мере готовности и сразу пропускаются
+        через accept (фильтр), так что считаются только годные кандидаты.
+        Как только набралось SEARCH_ENOUGH_CANDIDATES кандидатов или вышел
+        SEARCH_DEADLINE_SECONDS, оставшиеся запросы отменяются.
+        
+        Отмена по дедлайну записывается как отказ по таймауту только
+        отслеживаемым источникам не из CACHED_SOURCES (отдельные RSS-фиды):
+        их обработчики CancelledError не ловят, а запросы за кэшем
+        продолжаются и отчитываются сами.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.SEARCH_DEADLINE_SECONDS
+        started = time.monotonic()
+        
+        tasks = {
+            asyncio.create_task(self._run_hedged(name, factory)): name
+            for name, factory in sources
+        }
+        pending = set(tasks)
+        all_content = []
+        
+        try:
+            while pending:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    late = sorted(tasks[task] for task in pending)
+                    logger.info(f"⏱️ Дедлайн поиска истек, не дождались: {', '.join(late)}")
+                    for name in late:
+                        if name not in CACHED_SOURCES and name in self.health.sources:
+                            self.health.record_failure(name, time.monotonic() - started, 'timeout')
+                    break
+                
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        items = task.result()
+                        all_content.extend(accept(items) if accept else items)
+                
+                if len(all_content) >= config.SEARCH_ENOUGH_CANDIDATES:
+                    if pending:
+                        logger.info(f"⚡ Достаточно кандидатов ({len(all_content)}), не жду остальные источники")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        logger.info(f"⏱️ Поиск занял {time.monotonic() - started:.1f} с")
+        return all_content
+    
+    async def _run_hedged(self, name: str, factory: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """
+        Запускает запрос к источнику, при необходимости с дублирующим запросом
+        
+        Если у источника длинный хвост задержек (p95 выше SEARCH_HEDGE_DELAY),
+        через SEARCH_HEDGE_DELAY секунд отправляется дубль, и берется
+        первый успешный ответ. Источники за кэшем (CACHED_SOURCES)
+        и источники без истории в health не дублируются.
+        """
+        # get() завел бы запись и для локальных источников вроде RSS-кэша - она попала бы в /status
+        health = self.health.sources.get(name)
+        tail = health.latency_percentile(0.95) if health else None
+        hedge = (
+            config.SEARCH_HEDGE_ENABLED
+            and name not in CACHED_SOURCES
+            and health is not None
+            and health.state == CLOSED
+            and tail is not None
+            and tail > config.SEARCH_HEDGE_DELAY
+        )
+        
+        primary = asyncio.create_task(factory())
+        backup = None
+        try:
+            if not hedge:
+                return await primary
+            
+            done, _ = await asyncio.wait({primary}, timeout=config.SEARCH_HEDGE_DELAY)
+            if done:
+                return primary.result()
+            
+            logger.info(f"🔁 {name} отвечает медленно (p95 {tail:.1f} с), отправляю дублирующий запрос")
+            backup = asyncio.create_task(factory())
+            racers = {primary, backup}
+            while racers:
+                done, racers = await asyncio.wait(racers, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result():
+                        return task.result()
             return []
+        finally:
+            # И при отмене по дедлайну: asyncio.wait сам ожидаемые задачи не отменяет
+            for task in (primary, backup):
+                if task is not None:
+                    task.cancel()
     
-    async def find_content(self, topic: Optional[str] = None) -> Dict:
+    async def find_content(self, topic: Optional[str] = None, interactive: bool = False) -> Dict:
         """
         Главный метод: ищет контент по теме
         Возвращает лучший найденный материал
+        
+        Args:
+            topic: тема поиска (None - случайная из SEARCH_TOPICS)
+            interactive: поиск по команде администратора, ему доступен резерв квоты NewsAPI
         """
         # Выбираем случайную тему, если не указана
         if not topic and config.SEARCH_TOPICS:
@@ -122,31 +339,62 @@ class ContentFinder:
         if not topic:
             topic = "dreams and sleep science"
         
-        print(f"\n🎯 Ищу контент по теме: {topic}")
-        
-        # Запускаем все поиски параллельно
-        results = await asyncio.gather(
-            self.search_news_api(topic),
-            self.search_duckduckgo(topic),
-            self.parse_rss_feeds(),
-            return_exceptions=True
-        )
+        logger.info(f"🎯 Ищу контент по теме: {topic}")
         
-        # Собираем все результаты
-        all_content = []
-        for result in results:
-            if isinstance(result, list):
-                all_content.extend(result)
+        # Запускаем все поиски параллельно и собираем результаты по мере готовности
+        sources = [
+            ('NewsAPI', lambda: self.search_news_api(topic, interactive=interactive)),
+            ('DuckDuckGo', lambda: self.search_duckduckgo(topic)),
+        ]
+        if feed_crawler.is_running and feed_registry.has_entries():
+            # Фиды уже обходятся в фоне - берем готовые записи из кэша реестра
+            sources.append(('RSS-кэш', self.cached_rss_articles))
+        else:
+            # Каждый RSS-фид - отдельный источник, чтобы медленный фид не задерживал остальные
+            sources += [
+                (feed_url, lambda feed_url=feed_url: self._parse_feed(feed_url, max_per_feed=2))
+                for feed_url in config.RSS_FEEDS
+            ]
+        # Отсеиваем мусор по мере поступления, чтобы не тратить на него генерацию
+        filter_pass = self.filter.start(topic)
+        await self._gather_sources(sources, filter_pass.feed)
+        all_content = filter_pass.finish()
+        if all_content:
+            self.store.add_candidates(all_content, topic)
+            # Материалы, уже выбранные для постов, повторно не предлагаем
+            fresh = [item for item in all_content if not self.store.is_used(item.get('url', ''))]
+            if len(fresh) < len(all_content):
+                logger.info(f"♻️ Пропускаю уже использованные материалы: {len(all_content) - len(fresh)}")
+            all_content = fresh
+        if not all_content:
+            # Источники пусты, отдали только мусор или уже использованное - берем свежих кандидатов из пула
+            all_content = [
+                article.to_candidate()
+                for article in self.store.recent(config.FEED_FRESH_HOURS, topic=topic)
+            ]
+            if all_content:
+                logger.info(f"📦 Свежих кандидатов из источников нет, беру {len(all_content)} кандидатов из пула")
         
         if not all_content:
-            print("❌ Контент не найден!")
+            logger.error("❌ Контент не найден!")
             return None
         
-        # Выбираем случайный материал
-        selected = random.choice(all_content)
+        # Случайный порядок кандидатов; полный текст качаем только для первых N
+        random.shuffle(all_content)
+        top = [item for item in all_content if item.get('url')][:config.ARTICLE_FETCH_TOP_N]
+        await self.article_fetcher.enrich(top)
+        
+        # Предпочитаем кандидата, для которого удалось получить полный текст
+        selected = next(
+            (item for item in top if len(item.get('content') or '') >= FULL_TEXT_MIN_CHARS),
+            all_content[0]
+        )
+        
+        # Выбранный материал не должен вернуться из пула в следующий раз
+        self.store.mark_used(selected['url'])
         
-        print(f"✅ Выбран материал: {selected['title'][:50]}...")
-        print(f"📍 Источник: {selected['source']}")
+        logger.info(f"✅ Выбран материал: {selected['title'][:50]}...")
+        logger.info(f"📍 Источник: {selected['source']}")
         
         return {
             'topic': topic,
@@ -179,4 +427,5 @@ async def test_content_finder():
 
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(test_content_finder())
@@ -0,0 +1,340 @@
+"""
+Реестр RSS-фидов и фоновый обход с адаптивной частотой
+Каждый фид обновляется по своему интервалу, который подстраивается
+под реальную частоту публикаций; нагрузка на хосты ограничена
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+import httpx
+import config
+from feed_parser import fetch_feed
+from source_health import health_registry
+from state_file import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних ссылок фида помнить, чтобы отличать новые записи
+SEEN_LINKS_LIMIT = 50
+
+
+class FeedState:
+    """Состояние одного фида в реестре"""
+
+    def __init__(self, url: str, interval: float):
+        self.url = url
+        self.host = urlparse(url).netloc.lower()
+        self.interval = interval
+        # Первый обход размазываем по интервалу, чтобы не ударить всеми фидами разом
+        self.next_due = time.time() + random.uniform(0, min(interval, config.FEED_MIN_INTERVAL * 4))
+        self.last_fetch = 0.0
+        self.last_new_entry = 0.0
+        self.publish_gap: Optional[float] = None
+        self.title = ''
+        self.seen_links: List[str] = []
+        self.entries: List[Dict] = []
+
+    def to_dict(self) -> Dict:
+        return {
+            'url': self.url,
+            'interval': self.interval,
+            'next_due': self.next_due,
+            'last_fetch': self.last_fetch,
+            'last_new_entry': self.last_new_entry,
+            'publish_gap': self.publish_gap,
+            'title': self.title,
+            'seen_links': self.seen_links,
+            'entries': self.entries,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FeedState':
+        state = cls(data['url'], data.get('interval', config.FEED_DEFAULT_INTERVAL))
+        for key in ('next_due', 'last_fetch', 'last_new_entry', 'publish_gap', 'title', 'seen_links', 'entries'):
+            if key in data:
+                setattr(state, key, data[key])
+        return state
+
+    def update(self, title: str, entries: List[Dict]):
+        """
+        Учитывает результат обхода и пересчитывает интервал
+
+        Интервал стремится к половине среднего промежутка между
+        публикациями (EWMA); если новых записей нет, он растет.
+        """
+        now = time.time()
+        new_entries = [entry for entry in entries if entry.get('link') and entry['link'] not in self.seen_links]
+
+        if new_entries and self.last_fetch:
+            # Промежуток между публикациями: время с прошлой новой записи, деленное на число новых
+            since = now - (self.last_new_entry or self.last_fetch)
+            gap = since / len(new_entries)
+            self.publish_gap = gap if self.publish_gap is None else 0.3 * gap + 0.7 * self.publish_gap
+            self.interval = self.publish_gap / 2
+        elif not new_entries and self.last_fetch:
+            self.interval *= 1.5
+
+        self.interval = max(config.FEED_MIN_INTERVAL, min(config.FEED_MAX_INTERVAL, self.interval))
+        if new_entries:
+            self.last_new_entry = now
+        self.last_fetch = now
+        # Небольшой разброс, чтобы фиды с одинаковым интервалом не синхронизировались
+        self.next_due = now + self.interval * random.uniform(0.9, 1.1)
+
+        if title:
+            self.title = title
+        for entry in new_entries:
+            entry['fetched_at'] = now
+            entry['summary'] = (entry.get('summary') or '')[:config.FEED_SUMMARY_MAX_CHARS]
+        self.entries = (new_entries + self.entries)[:config.FEED_CRAWL_ENTRIES]
+        self.seen_links = ([entry['link'] for entry in new_entries] + self.seen_links)[:SEEN_LINKS_LIMIT]
+
+    def postpone(self):
+        """Откладывает фид после ошибки"""
+        self.next_due = time.time() + min(config.FEED_MAX_INTERVAL, self.interval * 2)
+
+
+class FeedRegistry:
+    """
+    Реестр фидов с сохранением состояния между перезапусками
+
+    Состояние каждого фида хранится уже закодированным в JSON; при
+    сохранении заново кодируются только измененные (mark_dirty) фиды.
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file or config.FEED_STATE_FILE
+        self.feeds: Dict[str, FeedState] = {}
+        self.loaded = False
+        # Есть изменения, которых еще нет на диске
+        self.unsaved = False
+        self._encoded: Dict[str, str] = {}
+        self._dirty: Set[str] = set()
+
+    def load(self):
+        """
+        Загружает список фидов (config + файл) и сохраненное состояние
+
+        Повторный вызов (горячая перезагрузка) добавляет новые фиды и
+        убирает исключенные; состояние остальных остается в памяти.
+        """
+        self._merge(*self._read())
+
+    async def load_async(self):
+        """load для работающего event loop: файлы читаются в отдельном потоке"""
+        saved, configured = await asyncio.to_thread(self._read)
+        self._merge(saved, configured)
+
+    def _read(self) -> Tuple[Dict[str, Dict], List[str]]:
+        """Сохраненное состояние и список фидов с диска; self.feeds не трогает"""
+        saved = {}
+        if self.state_file and os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, encoding='utf-8') as f:
+                    saved = {item['url']: item for item in json.load(f)}
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"⚠️ Не удалось прочитать состояние фидов: {e}")
+        return saved, self._configured_urls()
+
+    def _merge(self, saved: Dict[str, Dict], configured: List[str]):
+        for url in list(self.feeds):
+            if url not in configured:
+                del self.feeds[url]
+                self._encoded.pop(url, None)
+                self._dirty.discard(url)
+                self.unsaved = True
+
+        for url in configured:
+            if url in self.feeds:
+                continue
+            if url in saved:
+                self.feeds[url] = FeedState.from_dict(saved[url])
+            else:
+                self.feeds[url] = FeedState(url, config.FEED_DEFAULT_INTERVAL)
+            self.mark_dirty(self.feeds[url])
+
+        self.loaded = True
+        logger.info(f"📚 Реестр фидов: {len(self.feeds)} источников")
+
+    def _configured_urls(self) -> List[str]:
+        urls = list(config.RSS_FEEDS)
+        if config.FEEDS_FILE and os.path.exists(config.FEEDS_FILE):
+            with open(config.FEEDS_FILE, encoding='utf-8') as f:
+                urls += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        # Убираем дубликаты, сохраняя порядок
+        return list(dict.fromkeys(urls))
+
+    def mark_dirty(self, state: FeedState):
+        """Отмечает фид измененным: при следующем снимке он будет закодирован заново"""
+        self._dirty.add(state.url)
+        self.unsaved = True
+
+    def snapshot(self) -> List[str]:
+        """JSON состояния всех фидов для save; снимается в event loop"""
+        for url in self._dirty:
+            if url in self.feeds:
+                self._encoded[url] = json.dumps(self.feeds[url].to_dict(), ensure_ascii=False)
+        self._dirty.clear()
+        return [self._encoded[url] for url in self.feeds]
+
+    def save(self, encoded: Optional[List[str]] = None):
+        """
+        Сохраняет состояние на диск
+
+        Из потока передавайте снимок (snapshot): перезагрузка настроек
+        может в это время менять self.feeds в event loop.
+        """
+        if not self.state_file:
+            return
+        write_atomic(self.state_file, '[' + ','.join(self.snapshot() if encoded is None else encoded) + ']')
+
+    def due_feeds(self, limit: int) -> List[FeedState]:
+        """Фиды, которым пора обновиться, самые просроченные первыми"""
+        now = time.time()
+        due = [state for state in self.feeds.values() if state.next_due <= now]
+        due.sort(key=lambda state: state.next_due)
+        return due[:limit]
+
+    def has_entries(self) -> bool:
+        """Есть ли в кэше хоть одна запись"""
+        return any(state.entries for state in self.feeds.values())
+
+    def recent_articles(self, max_age_hours: float, limit: int) -> List[Dict]:
+        """Случайная выборка свежих записей из кэша фидов в формате кандидатов"""
+        cutoff = time.time() - max_age_hours * 3600
+        articles = [
+            {
+                'title': entry.get('title', ''),
+                'description': entry.get('summary', ''),
+                'url': entry.get('link', ''),
+                'source': state.title or 'RSS Feed',
+                'published': entry.get('published', '')
+            }
+            for state in self.feeds.values()
+            for entry in state.entries
+            if entry.get('fetched_at', 0) >= cutoff
+        ]
+        random.shuffle(articles)
+        return articles[:limit]
+
+
+class FeedCrawler:
+    """
+    Фоновый обход фидов
+
+    Раз в FEED_CRAWL_TICK секунд берет не более FEED_CRAWL_BATCH
+    просроченных фидов и обновляет их, держа не больше
+    FEED_PER_HOST_CONCURRENCY соединений на хост. Состояние пишется
+    на диск не чаще раза в FEED_STATE_SAVE_INTERVAL секунд.
+    """
+
+    def __init__(self, registry: 'FeedRegistry'):
+        self.registry = registry
+        self.health = health_registry
+        self.task: Optional[asyncio.Task] = None
+        self.last_save = time.monotonic()
+        self._host_limits: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(config.FEED_PER_HOST_CONCURRENCY)
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        """Запускает обход в фоне (нужен работающий event loop)"""
+        if self.is_running:
+            return
+        if not self.registry.loaded:
+            self.registry.load()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("✅ Фоновый обход фидов запущен")
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.registry.unsaved:
+            # Последние изменения, не дождавшиеся очередного сохранения
+            try:
+                self.registry.save()
+                self.registry.unsaved = False
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось сохранить состояние фидов: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.crawl_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка обхода фидов: {e}", exc_info=True)
+            await asyncio.sleep(config.FEED_CRAWL_TICK)
+
+    async def crawl_once(self) -> int:
+        """Обновляет порцию просроченных фидов; возвращает число обновленных"""
+        due = self.registry.due_feeds(config.FEED_CRAWL_BATCH)
+        updated = 0
+        if due:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=config.FEED_FETCH_TIMEOUT) as client:
+                results = await asyncio.gather(*(self._crawl_feed(state, client) for state in due))
+            # И обновленные, и отложенные фиды поменяли состояние
+            for state in due:
+                self.registry.mark_dirty(state)
+            updated = sum(results)
+            logger.info(f"📡 Обход фидов: обновлено {updated} из {len(due)}")
+
+        await self._save_if_due()
+        return updated
+
+    async def _save_if_due(self):
+        """Сохраняет состояние, если есть изменения и прошел FEED_STATE_SAVE_INTERVAL"""
+        if not self.registry.unsaved or time.monotonic() - self.last_save < config.FEED_STATE_SAVE_INTERVAL:
+            return
+        self.last_save = time.monotonic()
+        self.registry.unsaved = False
+        try:
+            await asyncio.to_thread(self.registry.save, self.registry.snapshot())
+        except OSError as e:
+            self.registry.unsaved = True
+            logger.warning(f"⚠️ Не удалось сохранить состояние фидов: {e}")
+
+    async def _crawl_feed(self, state: FeedState, client: httpx.AsyncClient) -> bool:
+        # Без строки в лог на каждый пропуск: открытие и восстановление breaker логирует SourceHealth
+        if not self.health.get(state.url).allow():
+            state.postpone()
+            return False
+
+        async with self._host_limits[state.host]:
+            started = time.monotonic()
+            try:
+                # Фид, отдающий по байту раз в несколько секунд, не должен держать весь обход
+                title, entries = await asyncio.wait_for(
+                    fetch_feed(state.url, config.FEED_CRAWL_ENTRIES, client),
+                    timeout=config.FEED_FETCH_DEADLINE
+                )
+            except asyncio.TimeoutError:
+                self.health.record_failure(state.url, time.monotonic() - started, 'timeout')
+                logger.warning(f"⚠️ Фид не загрузился за {config.FEED_FETCH_DEADLINE:.0f} с: {state.url}")
+                state.postpone()
+                return False
+            except Exception as e:
+                self.health.record_failure(state.url, time.monotonic() - started, str(e))
+                state.postpone()
+                return False
+
+        self.health.record_success(state.url, time.monotonic() - started)
+        state.update(title, entries)
+        return True
+
+
+# Общий реестр и обходчик для всех экземпляров ContentFinder
+feed_registry = FeedRegistry()
+feed_crawler = FeedCrawler(feed_registry)
@@ -3,17 +3,61 @@
 Превращает найденные материалы в уникальные посты
 """
 import asyncio
+import json
+import logging
+from typing import List, Optional, Tuple
 from groq import AsyncGroq
 import config
+from logging_setup import setup_logging
+from model_router import ModelRouter, parse_model_specs
+from post_archive import post_archive
+from post_scorer import score_post
+from source_health import SourceHealthRegistry
+from token_budget import TokenUsageTracker, estimate_messages_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Минимум токенов под текст статьи, даже если шаблон съел весь бюджет
+MIN_CONTENT_TOKENS = 150
+
+# Лимит длины сообщения Telegram и запас под ссылку на источник
+TELEGRAM_MESSAGE_LIMIT = 4096
+SOURCE_LINK_RESERVE = 300
+
+# Минимальная длина поста, который считается валидным
+MIN_POST_LENGTH = 200
+
+# Общий учет токенов для всех экземпляров движка (бот и планировщик)
+usage_tracker = TokenUsageTracker()
+
+# Общие квоты и здоровье моделей каскада
+model_specs = parse_model_specs(config.GROQ_MODELS)
+model_health = SourceHealthRegistry()
+
+
+class GeneratedPost:
+    """
+    Результат генерации: текст вместе с моделью и расходом токенов
+
+    Модель и расход относятся именно к этому вызову, поэтому одновременные
+    генерации (планировщик и команды) не путают их между собой.
+    """
+
+    def __init__(self, text: str, model: str = '', usage: Optional[dict] = None):
+        self.text = text
+        self.model = model
+        self.usage = usage
+
 
 class GroqEngine:
     """Класс для генерации контента через Groq AI"""
     
     def __init__(self):
         self.client = AsyncGroq(api_key=config.GROQ_API_KEY)
-        self.model = config.GROQ_MODEL
+        self.router = ModelRouter(self.client, model_specs, model_health)
+        self.usage = usage_tracker
     
-    async def generate_post(self, content_data: dict) -> str:
+    async def generate_post(self, content_data: dict, interactive: bool = False) -> GeneratedPost:
         """
         Генерирует пост на основе найденного контента
         
@@ -24,57 +68,177 @@ class GroqEngine:
                 - description: описание
                 - content: полный текст (опционально)
                 - url: ссылка на источник
+            interactive: пост для команды пользователя - запросы к модели
+                ограничены GROQ_INTERACTIVE_LATENCY_TARGET
         
         Returns:
-            Сгенерированный пост
+            Сгенерированный пост с моделью и расходом токенов
         """
         try:
-            print(f"\n🤖 Генерирую пост через Groq...")
+            logger.info("🤖 Генерирую пост через Groq...")
             
-            # Формируем промпт для Groq
+            # Формируем промпт для Groq в пределах бюджета токенов
             prompt = self._create_prompt(content_data)
-            
-            # Отправляем запрос в Groq
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": config.POST_STYLE_PROMPT
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.9,
-                max_tokens=800,
-                top_p=1.0
-            )
-            
-            # Извлекаем текст
-            generated_text = response.choices[0].message.content.strip()
-            
+            messages = [
+                {
+                    "role": "system",
+                    "content": config.POST_STYLE_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+            estimated_tokens = estimate_messages_tokens(messages)
+            latency_target = config.GROQ_INTERACTIVE_LATENCY_TARGET if interactive else None
+
+            post = None
+            if config.POST_VARIANTS > 1:
+                post = await self._generate_best_variant(
+                    messages, content_data.get('title', ''), estimated_tokens, latency_target
+                )
+            if post is None:
+                # Отправляем запрос в Groq
+                response, model = await self.router.complete(
+                    messages,
+                    latency_target=latency_target,
+                    temperature=0.9,
+                    max_tokens=config.POST_MAX_OUTPUT_TOKENS,
+                    top_p=1.0
+                )
+
+                # Извлекаем текст
+                post = GeneratedPost(
+                    response.choices[0].message.content.strip(),
+                    model,
+                    self._record_usage(response, model, content_data.get('title', ''), estimated_tokens)
+                )
+
             # Добавляем ссылку на источник внизу
-            if content_data.get('url'):
-                generated_text += f"\n\n🔗 Источник: {content_data['url']}"
+            post.text = self._attach_source(post.text, content_data)
             
-            print(f"✅ Пост сгенерирован! Длина: {len(generated_text)} символов")
+            logger.info(f"✅ Пост сгенерирован! Длина: {len(post.text)} символов")
             
-            return generated_text
+            return post
             
         except Exception as e:
-            print(f"❌ Ошибка генерации через Groq: {e}")
+            logger.error(f"❌ Ошибка генерации через Groq: {e}")
             raise
     
+    async def _generate_best_variant(self, messages: list, label: str,
+                                     estimated_tokens: int,
+                                     latency_target: Optional[float] = None) -> Optional[GeneratedPost]:
+        """
+        Генерирует POST_VARIANTS вариантов параллельно и выбирает лучший
+
+        Варианты оцениваются локально по мере поступления (post_scorer).
+        Как только один набирает POST_VARIANT_GOOD_SCORE, остальные
+        запросы отменяются, поэтому задержка - как у самого быстрого
+        хорошего варианта, а не у самого медленного. Варианты с нулевой
+        оценкой (короче MIN_POST_LENGTH или не влезающие в сообщение)
+        не выбираются; если других нет, возвращается None.
+        latency_target ограничивает каждый запрос, как в router.complete.
+        """
+        temperatures = [0.9, 0.75, 1.0, 0.85, 0.95]
+        tasks = [
+            asyncio.create_task(self.router.complete(
+                messages,
+                latency_target=latency_target,
+                temperature=temperatures[index % len(temperatures)],
+                max_tokens=config.POST_MAX_OUTPUT_TOKENS,
+                top_p=1.0
+            ))
+            for index in range(config.POST_VARIANTS)
+        ]
+
+        best = None
+        received = 0
+        try:
+            for future in asyncio.as_completed(tasks, timeout=config.POST_VARIANT_DEADLINE):
+                try:
+                    response, model = await future
+                except asyncio.TimeoutError:
+                    break
+                except Exception as e:
+                    logger.warning(f"⚠️ Вариант поста не сгенерирован: {e}")
+                    continue
+
+                received += 1
+                text = response.choices[0].message.content.strip()
+                usage = self._record_usage(response, model, f"{label} (вариант {received})", estimated_tokens)
+                score, parts = score_post(
+                    text, await self._phrase_overlap(text),
+                    max_length=TELEGRAM_MESSAGE_LIMIT - SOURCE_LINK_RESERVE,
+                    min_length=MIN_POST_LENGTH
+                )
+                logger.info(
+                    f"🎯 Вариант {received} ({model}): оценка {score:.2f} "
+                    + ', '.join(f"{name} {value:.2f}" for name, value in parts.items())
+                )
+                if score <= 0:
+                    continue
+
+                if best is None or score > best[0]:
+                    best = (score, GeneratedPost(text, model, usage))
+                if score >= config.POST_VARIANT_GOOD_SCORE:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if best is None:
+            logger.warning(f"⚠️ Из {received} полученных вариантов ни один не годится, генерирую обычным запросом")
+            return None
+
+        score, post = best
+        logger.info(f"🏆 Выбран вариант с оценкой {score:.2f} из {received} полученных")
+        return post
+
+    async def _phrase_overlap(self, text: str) -> float:
+        """Повтор фраз прошлых постов; ошибка архива не мешает генерации"""
+        try:
+            return await post_archive.phrase_overlap_async(text)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось проверить повторы: {e}")
+            return 0.0
+
+    def _attach_source(self, text: str, content_data: dict) -> str:
+        """Добавляет ссылку на источник в конец поста"""
+        if content_data.get('url'):
+            text += f"\n\n🔗 Источник: {content_data['url']}"
+        return text
+    
+    def _record_usage(self, response, model: str, label: str, estimated_tokens: int) -> Optional[dict]:
+        """Сохраняет расход токенов ответа в статистику по постам и дням и возвращает его"""
+        usage = self.usage.record_response(response, label, estimated_tokens, model)
+        if usage:
+            logger.info(
+                f"📊 {model}: промпт {usage['prompt_tokens']} "
+                f"(оценка {estimated_tokens}), ответ {usage['completion_tokens']} токенов"
+            )
+        return usage
+    
     def _create_prompt(self, content_data: dict) -> str:
-        """Создает промпт для Groq на основе контента"""
+        """Создает промпт для Groq на основе контента в пределах бюджета токенов"""
         
         topic = content_data.get('topic', 'сновидения')
         title = content_data.get('title', '')
         description = content_data.get('description', '')
-        content = content_data.get('content', description)
+        content = content_data.get('content') or description or ''
         
+        # Сколько токенов осталось на текст статьи после системного промпта и шаблона
+        template = self._prompt_template(topic, title, '')
+        overhead = estimate_messages_tokens([
+            {"role": "system", "content": config.POST_STYLE_PROMPT},
+            {"role": "user", "content": template},
+        ])
+        content_budget = max(MIN_CONTENT_TOKENS, config.PROMPT_INPUT_TOKEN_BUDGET - overhead)
+        content = truncate_to_tokens(content, content_budget)
+        
+        return self._prompt_template(topic, title, content)
+    
+    def _prompt_template(self, topic: str, title: str, content: str) -> str:
+        """Шаблон промпта для поста по материалу"""
         prompt = f"""
 На основе этого материала создай интересный пост для канала "Оракул Снов":
 
@@ -83,7 +247,7 @@ class GroqEngine:
 ЗАГОЛОВОК: {title}
 
 СОДЕРЖАНИЕ:
-{content[:1500]}
+{content}
 
 ЗАДАЧА:
 1. Создай захватывающий пост на русском языке (200-400 слов)
@@ -99,7 +263,164 @@ class GroqEngine:
 """
         return prompt
     
-    async def generate_custom_post(self, user_request: str) -> str:
+    async def generate_posts_batch(self, contents: List[dict]) -> List[Optional[GeneratedPost]]:
+        """
+        Генерирует несколько постов за один запрос к Groq
+        
+        Материалы упаковываются в один промпт, ответ запрашивается в JSON
+        и разбирается на отдельные посты. Для материалов, чей пост не прошел
+        проверку, выполняется обычная генерация по одному.
+        
+        Args:
+            contents: список словарей с данными контента (как в generate_post)
+        
+        Returns:
+            Список постов в том же порядке (None, если пост не удалось создать);
+            у постов из одного запроса общий расход токенов на весь запрос
+        """
+        posts: List[Optional[GeneratedPost]] = [None] * len(contents)
+        batch_size = max(1, config.GROQ_BATCH_SIZE)
+        
+        for start in range(0, len(contents), batch_size):
+            chunk = contents[start:start + batch_size]
+            parsed, model, usage = await self._generate_batch_chunk(chunk)
+            for offset, text in enumerate(parsed):
+                if text:
+                    posts[start + offset] = GeneratedPost(self._attach_source(text, chunk[offset]), model, usage)
+        
+        # Фолбэк: генерируем по одному то, что не удалось разобрать
+        failed = [index for index, post in enumerate(posts) if post is None]
+        if failed:
+            logger.warning(f"⚠️ Батч: {len(failed)} из {len(contents)} постов генерирую по одному")
+            results = await asyncio.gather(
+                *(self.generate_post(contents[index]) for index in failed),
+                return_exceptions=True
+            )
+            for index, result in zip(failed, results):
+                if isinstance(result, GeneratedPost):
+                    posts[index] = result
+        
+        logger.info(f"✅ Батч: сгенерировано {sum(1 for post in posts if post)} из {len(contents)} постов")
+        return posts
+    
+    async def _generate_batch_chunk(self, chunk: List[dict]) -> Tuple[List[Optional[str]], str, Optional[dict]]:
+        """Один запрос к Groq на несколько материалов; возвращает тексты без ссылок, модель и расход"""
+        if len(chunk) == 1:
+            # Для одного материала JSON-обертка не дает выигрыша
+            return [None], '', None
+        
+        try:
+            logger.info(f"🤖 Генерирую {len(chunk)} постов одним запросом к Groq...")
+            
+            prompt = self._create_batch_prompt(chunk)
+            messages = [
+                {
+                    "role": "system",
+                    "content": config.POST_STYLE_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+            estimated_tokens = estimate_messages_tokens(messages)
+            
+            response, model = await self.router.complete(
+                messages,
+                temperature=0.9,
+                max_tokens=config.POST_MAX_OUTPUT_TOKENS * len(chunk),
+                top_p=1.0,
+                response_format={"type": "json_object"}
+            )
+            
+            raw = response.choices[0].message.content
+            usage = self._record_usage(response, model, f"batch x{len(chunk)}", estimated_tokens)
+            return self._parse_batch_response(raw, len(chunk)), model, usage
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка батч-генерации через Groq: {e}")
+            return [None] * len(chunk), '', None
+    
+    def _create_batch_prompt(self, chunk: List[dict]) -> str:
+        """Создает общий промпт для нескольких материалов"""
+        
+        # Делим бюджет на материалы поровну
+        instructions = self._batch_instructions(len(chunk))
+        overhead = estimate_messages_tokens([
+            {"role": "system", "content": config.POST_STYLE_PROMPT},
+            {"role": "user", "content": instructions},
+        ])
+        per_item_budget = max(
+            MIN_CONTENT_TOKENS,
+            (config.PROMPT_INPUT_TOKEN_BUDGET * len(chunk) - overhead) // len(chunk)
+        )
+        
+        articles = []
+        for number, content_data in enumerate(chunk, start=1):
+            content = content_data.get('content') or content_data.get('description') or ''
+            articles.append(
+                f"### МАТЕРИАЛ {number}\n"
+                f"ТЕМА: {content_data.get('topic', 'сновидения')}\n"
+                f"ЗАГОЛОВОК: {content_data.get('title', '')}\n"
+                f"СОДЕРЖАНИЕ:\n{truncate_to_tokens(content, per_item_budget)}\n"
+            )
+        
+        return "\n".join(articles) + instructions
+    
+    def _batch_instructions(self, count: int) -> str:
+        """Инструкции для батч-промпта"""
+        return f"""
+ЗАДАЧА: для КАЖДОГО из {count} материалов выше создай отдельный пост для канала "Оракул Снов".
+
+Требования к каждому посту:
+1. Захватывающий пост на русском языке (200-400 слов)
+2. Мистическое вступление с эмодзи
+3. Научные факты простым языком и эзотерическая интерпретация
+4. В конце практический совет или вопрос для размышления
+5. Эмодзи для структуры: 🌙 💭 🔮 ✨ 🧠 📚
+6. НЕ указывай источник в тексте поста
+
+ФОРМАТ ОТВЕТА - строго JSON без пояснений:
+{{"posts": [{{"id": 1, "text": "текст поста"}}, ...]}}
+где id - номер материала от 1 до {count}.
+"""
+    
+    def _parse_batch_response(self, raw: str, count: int) -> List[Optional[str]]:
+        """Разбирает JSON-ответ батча и проверяет каждый пост"""
+        posts: List[Optional[str]] = [None] * count
+        
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Батч: ответ не является JSON: {e}")
+            return posts
+        
+        items = data.get('posts', []) if isinstance(data, dict) else []
+        if not isinstance(items, list):
+            return posts
+        
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('id')) - 1
+            except (TypeError, ValueError):
+                continue
+            text = item.get('text')
+            if not 0 <= index < count or not isinstance(text, str):
+                continue
+            text = text.strip()
+            if self._is_valid_post(text):
+                posts[index] = text
+        
+        return posts
+    
+    def _is_valid_post(self, text: str) -> bool:
+        """Проверяет, что пост подходит для публикации"""
+        # Запас под ссылку на источник
+        return MIN_POST_LENGTH <= len(text) <= TELEGRAM_MESSAGE_LIMIT - SOURCE_LINK_RESERVE
+    
+    async def generate_custom_post(self, user_request: str) -> GeneratedPost:
         """
         Генерирует пост по запросу пользователя (без поиска контента)
         
@@ -107,24 +428,22 @@ class GroqEngine:
             user_request: запрос от пользователя
         
         Returns:
-            Сгенерированный пост
+            Сгенерированный пост с моделью и расходом токенов
         """
         try:
-            print(f"\n🤖 Генерирую пост по запросу: {user_request[:50]}...")
+            logger.info(f"🤖 Генерирую пост по запросу: {user_request[:50]}...")
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": config.POST_STYLE_PROMPT
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""
+            messages = [
+                {
+                    "role": "system",
+                    "content": config.POST_STYLE_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": f"""
 Создай пост для канала "Оракул Снов" на тему:
 
-{user_request}
+{truncate_to_tokens(user_request, config.PROMPT_INPUT_TOKEN_BUDGET // 2)}
 
 Требования:
 - 200-400 слов на русском языке
@@ -132,21 +451,28 @@ class GroqEngine:
 - Сочетай научные факты и эзотерику
 - Будь увлекательным и информативным
 """
-                    }
-                ],
+                }
+            ]
+            estimated_tokens = estimate_messages_tokens(messages)
+            
+            # Интерактивная команда: укладываемся в целевую задержку, даже если большая модель перегружена
+            response, model = await self.router.complete(
+                messages,
+                latency_target=config.GROQ_INTERACTIVE_LATENCY_TARGET,
                 temperature=0.9,
-                max_tokens=800,
+                max_tokens=config.POST_MAX_OUTPUT_TOKENS,
                 top_p=1.0
             )
             
             generated_text = response.choices[0].message.content.strip()
+            usage = self._record_usage(response, model, user_request[:50], estimated_tokens)
             
-            print(f"✅ Кастомный пост сгенерирован!")
+            logger.info("✅ Кастомный пост сгенерирован!")
             
-            return generated_text
+            return GeneratedPost(generated_text, model, usage)
             
         except Exception as e:
-            print(f"❌ Ошибка генерации кастомного поста: {e}")
+            logger.error(f"❌ Ошибка генерации кастомного поста: {e}")
             raise
 
 
@@ -170,7 +496,7 @@ async def test_groq_engine():
     print("\n" + "="*60)
     print("📰 СГЕНЕРИРОВАННЫЙ ПОСТ:")
     print("="*60)
-    print(post)
+    print(post.text)
     print("="*60)
     
     print("\n📝 Тестирую кастомную генерацию...")
@@ -181,9 +507,18 @@ async def test_groq_engine():
     print("\n" + "="*60)
     print("📰 КАСТОМНЫЙ ПОСТ:")
     print("="*60)
-    print(custom_post)
+    print(custom_post.text)
     print("="*60)
+    
+    print("\n📝 Тестирую батч-генерацию...")
+    second_content = dict(test_content, title='Sleep Spindles and Memory Consolidation')
+    batch_posts = await engine.generate_posts_batch([test_content, second_content])
+    for number, batch_post in enumerate(batch_posts, start=1):
+        text = batch_post.text if batch_post else ''
+        print(f"\n--- Пост {number}: {len(text)} символов ---")
+        print(text)
 
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(test_groq_engine())
@@ -0,0 +1,178 @@
+"""
+Неблокирующее структурированное логирование
+Записи кладутся в очередь, а на диск и в консоль их пишет отдельный поток
+"""
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+import config
+
+# Идентификатор текущего конвейера (поиск -> генерация -> публикация)
+correlation_id = contextvars.ContextVar('correlation_id', default='-')
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+
+# Стандартные атрибуты LogRecord, которые не попадают в extra
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'correlation_id'}
+
+
+class CorrelationFilter(logging.Filter):
+    """Добавляет в запись correlation_id из контекста вызывающего кода"""
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который никогда не ждет
+
+    При переполнении очереди запись отбрасывается и учитывается в счетчике,
+    вместо того чтобы блокировать event loop.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Форматируем сообщение и исключение здесь, а оформление оставляем слушателю
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна JSON-строка"""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'correlation_id': getattr(record, 'correlation_id', '-'),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        if record.stack_info:
+            payload['stack'] = record.stack_info
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _file_handler() -> logging.Handler:
+    """Файловый обработчик с ротацией по размеру или по времени"""
+    if config.LOG_ROTATION == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            config.LOG_FILE,
+            when=config.LOG_ROTATION_WHEN,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        config.LOG_FILE,
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+
+
+def setup_logging():
+    """
+    Настраивает логирование через очередь
+
+    Корневой логгер получает только QueueHandler; файловый и консольный
+    обработчики работают в потоке QueueListener. Повторный вызов ничего не делает.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    if config.LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s'
+        )
+
+    handlers = [logging.StreamHandler()]
+    if config.LOG_FILE:
+        handlers.append(_file_handler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(CorrelationFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    # Болтливые HTTP-библиотеки - только предупреждения
+    for noisy in ('httpx', 'httpcore', 'apscheduler.executors'):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Дописывает очередь и останавливает поток логирования"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """Сколько записей отброшено из-за переполнения очереди"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+@contextmanager
+def pipeline_context(prefix: str = 'post'):
+    """Назначает новый correlation_id для всех записей внутри блока"""
+    token = correlation_id.set(f"{prefix}-{uuid.uuid4().hex[:8]}")
+    try:
+        yield correlation_id.get()
+    finally:
+        correlation_id.reset(token)
+
+
+def correlated(prefix: str):
+    """Декоратор корутины: каждый вызов получает свой correlation_id"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with pipeline_context(prefix):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
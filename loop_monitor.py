@@ -0,0 +1,130 @@
+"""
+Сторож event loop: задержка планирования и поиск блокирующего кода
+Одна корутина измеряет, насколько позже положенного она просыпается;
+поток-сторож, заметив, что loop завис, снимает стек потока loop
+и пишет его в лог - прямо в момент блокировки
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних замеров задержки хранить для перцентилей
+LAG_WINDOW = 600
+
+# Сколько кадров стека блокирующего кода писать в лог
+STACK_LIMIT = 25
+
+
+class LoopLagMonitor:
+    """
+    Измеряет задержку event loop и ловит блокировки
+
+    Корутина засыпает на interval и считает, на сколько проснулась
+    позже (lag). Поток-сторож проверяет время последнего пробуждения:
+    если loop не отвечает дольше interval + threshold, он снимает стек
+    потока loop через sys._current_frames() - это и есть код,
+    который держит loop.
+    """
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None):
+        self.interval = interval or config.LOOP_LAG_INTERVAL
+        self.threshold = threshold or config.LOOP_LAG_THRESHOLD
+        self.lags = deque(maxlen=LAG_WINDOW)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запускает замеры (нужен работающий event loop)"""
+        if self.is_running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"✅ Сторож event loop запущен (интервал {self.interval} с, порог {self.threshold} с)"
+        )
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self._heartbeat = time.monotonic()
+            if lag > self.threshold:
+                logger.warning(f"🐢 Event loop опоздал на {lag * 1000:.0f} мс")
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled_for = time.monotonic() - beat - self.interval
+            if stalled_for <= self.threshold or beat == reported_beat:
+                continue
+            # Одна запись на одну блокировку
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame, limit=STACK_LIMIT)) if frame else 'стек недоступен\n'
+            logger.warning(
+                f"🧱 Event loop заблокирован уже {stalled_for * 1000:.0f} мс, стек блокирующего кода:\n{stack}"
+            )
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.lags:
+            return None
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def metrics(self) -> Dict[str, float]:
+        """Метрики задержки в секундах (для /status и внешнего сбора)"""
+        return {
+            'loop_lag_last': self.lags[-1] if self.lags else 0.0,
+            'loop_lag_p50': self.percentile(0.5) or 0.0,
+            'loop_lag_p99': self.percentile(0.99) or 0.0,
+            'loop_lag_max': self.max_lag,
+            'loop_stalls': self.stalls,
+        }
+
+    def summary(self) -> str:
+        """Одна строка для /status"""
+        if not self.lags:
+            return 'Event loop: замеров еще нет'
+        metrics = self.metrics()
+        return (
+            f"Event loop: задержка {metrics['loop_lag_last'] * 1000:.0f} мс, "
+            f"p50 {metrics['loop_lag_p50'] * 1000:.0f} мс, p99 {metrics['loop_lag_p99'] * 1000:.0f} мс, "
+            f"макс {metrics['loop_lag_max'] * 1000:.0f} мс, блокировок {self.stalls}"
+        )
+
+
+# Общий сторож для процесса (один event loop)
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,154 @@
+"""
+Маршрутизация запросов между моделями Groq
+Упорядоченный каскад моделей с бюджетом задержки и собственной квотой
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Tuple
+import config
+from source_health import SourceHealthRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSpec:
+    """Модель в каскаде: бюджет задержки и квоты запросов"""
+
+    def __init__(self, name: str, latency_budget: float, requests_per_minute: int, requests_per_day: int):
+        self.name = name
+        self.latency_budget = latency_budget
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_day = requests_per_day
+        self._minute_window = deque()
+        self._day = ''
+        self._day_count = 0
+
+    def has_quota(self) -> bool:
+        """Есть ли свободная квота на запрос прямо сейчас"""
+        now = time.monotonic()
+        while self._minute_window and now - self._minute_window[0] >= 60:
+            self._minute_window.popleft()
+        if self.requests_per_minute and len(self._minute_window) >= self.requests_per_minute:
+            return False
+
+        today = datetime.now().strftime('%Y-%m-%d')
+        if today != self._day:
+            self._day = today
+            self._day_count = 0
+        return not self.requests_per_day or self._day_count < self.requests_per_day
+
+    def consume(self):
+        """Учитывает отправленный запрос в квоте"""
+        self._minute_window.append(time.monotonic())
+        self._day_count += 1
+
+
+def parse_model_specs(raw: str) -> List[ModelSpec]:
+    """
+    Разбирает описание каскада моделей
+
+    Формат: "модель:бюджет_с:запросов_в_минуту:запросов_в_день,..."
+    Числовые поля можно опускать (0 - без ограничения).
+    """
+    specs = []
+    for item in raw.split(','):
+        parts = [part.strip() for part in item.split(':')]
+        if not parts[0]:
+            continue
+        numbers = parts[1:] + [''] * (3 - len(parts[1:]))
+        specs.append(ModelSpec(
+            name=parts[0],
+            latency_budget=float(numbers[0] or 30),
+            requests_per_minute=int(numbers[1] or 0),
+            requests_per_day=int(numbers[2] or 0)
+        ))
+    return specs
+
+
+class ModelRouter:
+    """Каскад моделей: основная модель с откатом на более быстрые"""
+
+    def __init__(self, client, specs: Optional[List[ModelSpec]] = None,
+                 health: Optional[SourceHealthRegistry] = None):
+        self.client = client
+        self.specs = specs or parse_model_specs(config.GROQ_MODELS)
+        self.health = health or SourceHealthRegistry()
+
+    async def complete(self, messages: list, latency_target: Optional[float] = None, **kwargs) -> Tuple[object, str]:
+        """
+        Выполняет chat.completions.create через первую подходящую модель
+
+        Модель пропускается, если у нее нет квоты, открыт circuit breaker
+        или ее средняя задержка не укладывается в оставшееся время.
+        Медленный ответ прерывается по бюджету задержки модели, и
+        запрос уходит следующей модели. При общем лимите каждой модели,
+        кроме последней, достается время за вычетом бюджета следующей
+        доступной модели, чтобы откату было на что опереться.
+
+        Args:
+            messages: сообщения чата
+            latency_target: общий лимит времени на запрос (для интерактивных команд)
+            **kwargs: остальные параметры chat.completions.create
+
+        Returns:
+            (ответ Groq, имя модели, которая его дала)
+        """
+        started = time.monotonic()
+        last_error: Optional[Exception] = None
+
+        for index, spec in enumerate(self.specs):
+            is_last = index == len(self.specs) - 1
+            remaining = None if latency_target is None else latency_target - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                break
+
+            health = self.health.get(spec.name)
+            if not spec.has_quota():
+                logger.info(f"⏭️ {spec.name}: квота исчерпана")
+                continue
+            if not is_last and remaining is not None and health.latency_ewma and health.latency_ewma > remaining:
+                logger.info(f"⏭️ {spec.name}: средняя задержка {health.latency_ewma:.1f} с не укладывается в {remaining:.1f} с")
+                continue
+            if not self.health.allow(spec.name):
+                continue
+
+            timeout = spec.latency_budget
+            if remaining is not None:
+                if is_last:
+                    # Последней модели отдаем все оставшееся время
+                    timeout = remaining
+                else:
+                    timeout = min(spec.latency_budget, remaining - self._fallback_budget(index))
+                    if timeout <= 0:
+                        logger.info(f"⏭️ {spec.name}: оставшиеся {remaining:.1f} с нужны резервной модели")
+                        continue
+
+            spec.consume()
+            call_started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(model=spec.name, messages=messages, **kwargs),
+                    timeout=timeout
+                )
+                self.health.record_success(spec.name, time.monotonic() - call_started)
+                return response, spec.name
+            except asyncio.TimeoutError as e:
+                last_error = e
+                self.health.record_failure(spec.name, time.monotonic() - call_started, 'timeout')
+                logger.warning(f"⚠️ {spec.name} не ответила за {timeout:.1f} с, переключаюсь на следующую модель")
+            except Exception as e:
+                last_error = e
+                self.health.record_failure(spec.name, time.monotonic() - call_started, str(e))
+                logger.warning(f"⚠️ Ошибка модели {spec.name}: {e}")
+
+        raise RuntimeError(f"Ни одна модель не ответила: {last_error}")
+
+    def _fallback_budget(self, index: int) -> float:
+        """Бюджет задержки следующей модели каскада, у которой есть квота (0, если такой нет)"""
+        for spec in self.specs[index + 1:]:
+            if spec.has_quota():
+                return spec.latency_budget
+        return 0.0
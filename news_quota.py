@@ -0,0 +1,152 @@
+"""
+Учет и планирование суточной квоты запросов NewsAPI
+Расход сохраняется между перезапусками; бюджет равномерно
+распределяется по запускам, а при нехватке темы объединяются в OR-запрос
+"""
+import json
+import logging
+import math
+import os
+import random
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import config
+from state_file import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Ограничение NewsAPI на длину параметра q
+MAX_QUERY_LENGTH = 500
+
+
+def _today() -> str:
+    # Квота NewsAPI сбрасывается по UTC
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def _day_elapsed() -> float:
+    """Доля прошедших UTC-суток (0..1)"""
+    now = datetime.now(timezone.utc)
+    return (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+
+
+class NewsApiQuota:
+    """
+    Счетчик запросов NewsAPI за текущие сутки
+
+    Запрос разрешается, если расход не обгоняет равномерный темп
+    (доля прошедших суток × дневной бюджет). Последние NEWSAPI_RESERVE
+    запросов оставлены для ручных постов.
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file or config.NEWSAPI_QUOTA_FILE
+        self.day = _today()
+        self.used = 0
+        self.exhausted = False
+        self._load()
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать учет квоты NewsAPI: {e}")
+            return
+        if data.get('day') == self.day:
+            self.used = int(data.get('used', 0))
+            self.exhausted = bool(data.get('exhausted', False))
+
+    def save(self):
+        """Сохраняет расход на диск"""
+        if not self.state_file:
+            return
+        write_atomic(self.state_file, json.dumps({'day': self.day, 'used': self.used, 'exhausted': self.exhausted}))
+
+    def _roll_day(self):
+        today = _today()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+            self.exhausted = False
+
+    @property
+    def remaining(self) -> int:
+        self._roll_day()
+        if self.exhausted:
+            return 0
+        return max(0, config.NEWSAPI_DAILY_LIMIT - self.used)
+
+    def runs_left(self) -> int:
+        """Сколько автоматических запусков осталось до конца суток"""
+        runs_per_day = len(config.POST_SLOTS) or 24 / max(config.POST_INTERVAL_HOURS, 1)
+        return max(1, math.ceil(runs_per_day * (1 - _day_elapsed())))
+
+    def plan(self, topic: str, interactive: bool = False) -> Tuple[Optional[str], List[str]]:
+        """
+        Решает, тратить ли запрос, и строит запрос
+
+        Args:
+            topic: тема текущего поиска
+            interactive: запрос по команде администратора (может брать резерв)
+
+        Returns:
+            (строка запроса или None, если запрос сейчас не положен;
+             объединенные в запрос темы, первая - topic)
+        """
+        remaining = self.remaining
+        budget = remaining if interactive else remaining - config.NEWSAPI_RESERVE
+        if budget <= 0:
+            return None, []
+
+        daily_budget = config.NEWSAPI_DAILY_LIMIT - config.NEWSAPI_RESERVE
+        if not interactive and self.used >= daily_budget * _day_elapsed() + 1:
+            # Обгоняем равномерный темп - пропускаем этот запуск
+            return None, []
+
+        runs_left = self.runs_left()
+        if interactive or budget >= runs_left:
+            return topic, [topic]
+
+        # Бюджета меньше, чем запусков: одним запросом покрываем несколько тем
+        wanted = min(config.NEWSAPI_MAX_OR_TOPICS, math.ceil(runs_left / budget))
+        return self._merge_topics(topic, wanted)
+
+    @staticmethod
+    def _merge_topics(topic: str, wanted: int) -> Tuple[str, List[str]]:
+        others = [other for other in config.SEARCH_TOPICS if other != topic]
+        random.shuffle(others)
+        topics = [topic]
+        query = f"({topic})"
+        for other in others[:wanted - 1]:
+            candidate = f"{query} OR ({other})"
+            if len(candidate) > MAX_QUERY_LENGTH:
+                break
+            query = candidate
+            topics.append(other)
+        return (query if len(topics) > 1 else topic), topics
+
+    def consume(self):
+        """Учитывает отправленный запрос (до ответа, чтобы параллельные поиски не проели лишнее)"""
+        self._roll_day()
+        self.used += 1
+
+    def mark_exhausted(self):
+        """NewsAPI ответил rateLimited - до конца суток запросов не будет"""
+        self._roll_day()
+        self.exhausted = True
+
+    def summary(self) -> str:
+        """Одна строка для /status"""
+        remaining = self.remaining
+        state = ' (исчерпана)' if self.exhausted else ''
+        return (
+            f"NewsAPI: {self.used}/{config.NEWSAPI_DAILY_LIMIT} запросов сегодня{state}, "
+            f"осталось {remaining}, запусков до конца суток ~{self.runs_left()}"
+        )
+
+
+# Общий учет квоты для бота, планировщика и команд
+newsapi_quota = NewsApiQuota()
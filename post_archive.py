@@ -0,0 +1,158 @@
+"""
+Архив опубликованных постов с полнотекстовым поиском (SQLite FTS5)
+Используется командой /search и для проверки повторов формулировок
+"""
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    published_at TEXT NOT NULL,
+    message_id INTEGER,
+    topic TEXT,
+    title TEXT,
+    source TEXT,
+    source_url TEXT,
+    model TEXT,
+    text TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    text, title, topic,
+    content='posts', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts(rowid, text, title, topic) VALUES (new.id, new.text, new.title, new.topic);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, text, title, topic)
+    VALUES ('delete', old.id, old.text, old.title, old.topic);
+END;
+"""
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Слова короче этого не используются для поиска похожих постов
+MIN_SIMILAR_WORD_LENGTH = 5
+
+
+def _fts_query(text: str, operator: str = ' ') -> str:
+    """Безопасный FTS5-запрос: каждое слово в кавычках"""
+    words = _WORD_RE.findall(text)
+    return operator.join(f'"{word}"' for word in words)
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = [word.lower() for word in _WORD_RE.findall(text)]
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def post_link(message_id: Optional[int]) -> str:
+    """Ссылка на пост в канале"""
+    if not message_id or not config.CHANNEL_USERNAME:
+        return ''
+    return f"https://t.me/{config.CHANNEL_USERNAME.replace('@', '')}/{message_id}"
+
+
+class PostArchive:
+    """Хранилище опубликованных постов"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.ARCHIVE_DB
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def add_post(self, text: str, message_id: Optional[int] = None, topic: str = '', title: str = '',
+                 source: str = '', source_url: str = '', model: str = '') -> int:
+        """Сохраняет пост; индекс FTS обновляется триггером"""
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                'INSERT INTO posts (published_at, message_id, topic, title, source, source_url, model, text) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (datetime.now().isoformat(timespec='seconds'), message_id, topic, title,
+                 source, source_url, model, text)
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Ищет посты по словам запроса (все слова должны встретиться)"""
+        match = _fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT p.id, p.published_at, p.message_id, p.topic, p.source, p.model, "
+                "snippet(posts_fts, 0, '«', '»', '…', 12) AS snippet "
+                "FROM posts_fts JOIN posts p ON p.id = posts_fts.rowid "
+                "WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        return [dict(row, link=post_link(row['message_id'])) for row in rows]
+
+    def similar_posts(self, text: str, limit: int = 5) -> List[Dict]:
+        """Прошлые посты, ближе всего похожие на текст по словам (bm25)"""
+        words = {word.lower() for word in _WORD_RE.findall(text) if len(word) >= MIN_SIMILAR_WORD_LENGTH}
+        if not words:
+            return []
+        match = _fts_query(' '.join(sorted(words)), operator=' OR ')
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT p.id, p.message_id, p.text FROM posts_fts JOIN posts p ON p.id = posts_fts.rowid '
+                'WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts) LIMIT ?',
+                (match, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def phrase_overlap(self, text: str) -> float:
+        """
+        Доля совпадающих трехсловных фраз с самым похожим прошлым постом
+
+        0 - ничего общего, 1 - текст целиком повторяет прошлый пост.
+        """
+        shingles = _shingles(text)
+        if not shingles:
+            return 0.0
+        best = 0.0
+        for post in self.similar_posts(text):
+            other = _shingles(post['text'])
+            if other:
+                best = max(best, len(shingles & other) / len(shingles))
+        return best
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+
+    # Асинхронные обертки: запросы к диску не выполняются в event loop
+
+    async def add_post_async(self, *args, **kwargs) -> int:
+        return await asyncio.to_thread(self.add_post, *args, **kwargs)
+
+    async def search_async(self, query: str, limit: int = 10) -> List[Dict]:
+        return await asyncio.to_thread(self.search, query, limit)
+
+    async def phrase_overlap_async(self, text: str) -> float:
+        return await asyncio.to_thread(self.phrase_overlap, text)
+
+
+# Общий архив для бота, планировщика и команд
+post_archive = PostArchive()
@@ -0,0 +1,88 @@
+"""
+Локальная оценка качества сгенерированного поста
+Длина, структура и эмодзи из промпта, язык, повтор фраз прошлых постов
+"""
+import re
+from typing import Dict, Tuple
+import config
+
+# Длина поста, которую просит промпт (200-400 слов)
+MIN_WORDS = 200
+MAX_WORDS = 400
+
+# Эмодзи, которые промпт просит использовать для структуры
+STRUCTURE_EMOJI = ('🌙', '💭', '🔮', '✨', '🧠', '📚')
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Веса составляющих оценки (в сумме 1)
+WEIGHTS = {
+    'length': 0.3,
+    'structure': 0.25,
+    'language': 0.2,
+    'novelty': 0.25,
+}
+
+
+def _length_score(text: str) -> float:
+    words = len(_WORD_RE.findall(text))
+    if MIN_WORDS <= words <= MAX_WORDS:
+        return 1.0
+    if words < MIN_WORDS:
+        return max(0.0, words / MIN_WORDS)
+    return max(0.0, 1 - (words - MAX_WORDS) / MAX_WORDS)
+
+
+def _structure_score(text: str) -> float:
+    stripped = text.strip()
+    checks = [
+        # Мистическое вступление с эмодзи
+        bool(stripped) and not stripped[0].isalnum(),
+        # Хотя бы три эмодзи из списка
+        sum(1 for emoji in STRUCTURE_EMOJI if emoji in text) >= 3,
+        # Несколько абзацев
+        len([part for part in re.split(r'\n\s*\n', stripped) if part.strip()]) >= 3,
+        # Вопрос для размышления или совет в финале
+        '?' in stripped[-300:] or 'совет' in stripped[-400:].lower(),
+    ]
+    return sum(checks) / len(checks)
+
+
+def _language_score(text: str) -> float:
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return 0.0
+    cyrillic = sum(1 for char in letters if 'а' <= char.lower() <= 'я' or char in 'ёЁ')
+    ratio = cyrillic / len(letters)
+    return ratio if config.CONTENT_LANGUAGE == 'ru' else 1 - ratio
+
+
+def score_post(text: str, overlap: float = 0.0, max_length: int = 0,
+               min_length: int = 0) -> Tuple[float, Dict[str, float]]:
+    """
+    Оценивает пост от 0 до 1
+
+    Args:
+        text: текст поста без ссылки на источник
+        overlap: доля фраз, повторяющих прошлые посты (из архива)
+        max_length: максимальная длина текста (0 - без ограничения)
+        min_length: минимальная длина текста; короче - оценка 0
+
+    Returns:
+        (итоговая оценка, оценки по составляющим)
+    """
+    if not text or (max_length and len(text) > max_length):
+        # Не влезет в сообщение - не публикуем вовсе
+        return 0.0, {'length': 0.0}
+    if len(text) < min_length:
+        # Обрывок ответа - не пост, как бы хорошо ни выглядели остальные составляющие
+        return 0.0, {'length': 0.0}
+
+    parts = {
+        'length': _length_score(text),
+        'structure': _structure_score(text),
+        'language': _language_score(text),
+        'novelty': max(0.0, 1 - overlap / max(config.MAX_PHRASE_OVERLAP, 0.01)),
+    }
+    total = sum(WEIGHTS[name] * value for name, value in parts.items())
+    return total, parts
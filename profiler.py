@@ -0,0 +1,210 @@
+"""
+Профилирование работающего процесса по запросу
+Сэмплирующий профайлер стеков, tracemalloc и рост RSS за заданное окно
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк выводить в каждом разделе отчета
+TOP_N = 20
+
+_active = threading.Lock()
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (Linux: /proc, иначе пиковый RSS из getrusage)"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS отдает байты, Linux - килобайты
+        return usage if sys.platform == 'darwin' else usage * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+_labels = {}
+
+
+def _frame_label(frame) -> str:
+    """Подпись функции кадра (кэшируется по code-объекту)"""
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if not filename.startswith('<'):
+            relative = os.path.relpath(filename)
+            # Библиотечные модули: оставляем только хвост пути
+            filename = relative if not relative.startswith('..') else '/'.join(filename.split(os.sep)[-2:])
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        _labels[code] = label
+    return label
+
+
+def _is_idle(frame) -> bool:
+    """Поток event loop ждет событий в селекторе, а не выполняет код"""
+    code = frame.f_code
+    return code.co_name == 'select' and code.co_filename.endswith('selectors.py')
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер на потоке
+
+    Каждые interval секунд снимает стек потока thread_id (по умолчанию -
+    всех потоков) через sys._current_frames() и считает функции на
+    вершине стека (self) и во всем стеке (total). Сэмплы, где поток
+    простаивает в селекторе event loop, учитываются отдельно (idle).
+    Накладные расходы не зависят от числа вызовов в профилируемом коде.
+    """
+
+    def __init__(self, interval: float = 0.01, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.samples = 0
+        self.idle = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                if _is_idle(frame):
+                    self.idle += 1
+                    continue
+                self.samples += 1
+                self.self_counts[_frame_label(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    label = _frame_label(frame)
+                    if label not in seen:
+                        self.total_counts[label] += 1
+                        seen.add(label)
+                    frame = frame.f_back
+
+
+def _format_report(seconds: float, profiler: SamplingProfiler, stats, rss_before: int, rss_after: int,
+                   workload_note: str) -> str:
+    lines = [
+        f"Профиль процесса {os.getpid()} от {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+        f"Окно: {seconds:.1f} с, сэмплов: {profiler.samples} (и {profiler.idle} в простое), "
+        f"интервал {profiler.interval * 1000:.0f} мс",
+        f"RSS: {rss_before / 1048576:.1f} МБ -> {rss_after / 1048576:.1f} МБ "
+        f"({(rss_after - rss_before) / 1048576:+.1f} МБ)",
+        "Внимание: tracemalloc замедляет код с частыми выделениями памяти, время в окне завышено",
+    ]
+    if workload_note:
+        lines.append(workload_note)
+
+    total = max(profiler.samples, 1)
+    lines += ['', f"=== Топ-{TOP_N} функций по собственному времени ==="]
+    for label, count in profiler.self_counts.most_common(TOP_N):
+        lines.append(f"{count / total:6.1%}  {label}")
+
+    lines += ['', f"=== Топ-{TOP_N} функций по суммарному времени (со вложенными) ==="]
+    for label, count in profiler.total_counts.most_common(TOP_N):
+        lines.append(f"{count / total:6.1%}  {label}")
+
+    lines += ['', f"=== Топ-{TOP_N} мест выделения памяти (прирост за окно) ==="]
+    for stat in stats[:TOP_N]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size_diff / 1024:+9.1f} КБ  {stat.count_diff:+7d} блоков  "
+            f"{frame.filename}:{frame.lineno}"
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def _memory_diff(snapshot_before) -> list:
+    """Прирост выделений памяти с момента snapshot_before (по строкам кода)"""
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    return tracemalloc.take_snapshot().filter_traces(filters).compare_to(
+        snapshot_before.filter_traces(filters), 'lineno'
+    )
+
+
+async def profile_window(seconds: float, workload: Optional[Callable[[], Awaitable]] = None) -> str:
+    """
+    Профилирует процесс в течение seconds секунд
+
+    Сэмплируется только поток event loop, из которого вызвана функция:
+    остальные потоки (логирование, сторож цикла, пул to_thread) почти
+    все время спят и только размывают отчет. Снимки tracemalloc и их
+    сравнение выполняются в отдельном потоке.
+
+    Args:
+        seconds: длина окна
+        workload: корутина-функция, которую нужно выполнить внутри окна
+            (например, полный цикл create_and_publish_post). Окно
+            продлевается до ее завершения.
+
+    Returns:
+        Текстовый отчет: топ функций, топ мест выделения памяти, рост RSS
+    """
+    if not _active.acquire(blocking=False):
+        raise RuntimeError("Профилирование уже выполняется")
+
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            # Одного кадра хватает для статистики по строкам; глубже - заметно дороже
+            tracemalloc.start(1)
+        snapshot_before = await asyncio.to_thread(tracemalloc.take_snapshot)
+        rss_before = rss_bytes()
+
+        profiler = SamplingProfiler(thread_id=threading.get_ident())
+        profiler.start()
+        started = time.monotonic()
+        workload_note = ''
+        try:
+            if workload is not None:
+                workload_started = time.monotonic()
+                result = await workload()
+                workload_note = f"Нагрузка выполнена за {time.monotonic() - workload_started:.1f} с, результат: {result}"
+            remaining = seconds - (time.monotonic() - started)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        finally:
+            profiler.stop()
+
+        elapsed = time.monotonic() - started
+        rss_after = rss_bytes()
+        stats = await asyncio.to_thread(_memory_diff, snapshot_before)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _active.release()
+
+    report = _format_report(elapsed, profiler, stats, rss_before, rss_after, workload_note)
+    logger.info(f"📈 Профиль снят: {elapsed:.1f} с, {profiler.samples} сэмплов")
+    return report
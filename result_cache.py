@@ -0,0 +1,154 @@
+"""
+Кэш результатов поисковых источников (NewsAPI, DuckDuckGo)
+Ключ - источник, запрос и параметры. Свежий результат отдается сразу,
+устаревший - тоже сразу, но с обновлением в фоне (stale-while-revalidate).
+Кэш сохраняется на диск и переживает перезапуски.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import config
+from state_file import write_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(source: str, query: str, params: Dict) -> str:
+    return f"{source}|{query.strip().lower()}|{json.dumps(params, sort_keys=True)}"
+
+
+def _copy(results: List[Dict]) -> List[Dict]:
+    # Кандидатов дальше дополняют и чистят на месте - отдаем копии
+    return [dict(item) for item in results]
+
+
+class SourceResultCache:
+    """
+    Кэш с TTL и окном stale-while-revalidate
+
+    - моложе SOURCE_CACHE_TTL: отдается как есть;
+    - моложе TTL + SOURCE_CACHE_STALE: отдается сразу, в фоне идет обновление;
+    - старше: запрос к источнику; если он вернул пусто, отдается старый результат.
+
+    Одновременные промахи по одному ключу делят один запрос к источнику.
+    Пустые ответы (ошибка, пропуск из-за квоты) не кэшируются.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.SOURCE_CACHE_FILE
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._loaded = False
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _load(self):
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать кэш источников: {e}")
+
+    def save(self, entries: Optional[Dict[str, Dict]] = None):
+        """Сохраняет кэш на диск"""
+        if not self.path:
+            return
+        write_atomic(self.path, json.dumps(self.entries if entries is None else entries, ensure_ascii=False))
+
+    async def get_or_fetch(self, source: str, query: str, params: Dict,
+                           fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """
+        Результаты источника по запросу - из кэша или от источника
+
+        Args:
+            source: имя источника
+            query: поисковый запрос
+            params: прочие параметры запроса (входят в ключ)
+            fetch: корутина-функция, выполняющая запрос к источнику
+        """
+        if not self._loaded:
+            self._load()
+
+        key = _cache_key(source, query, params)
+        entry = self.entries.get(key)
+        age = time.time() - entry['stored_at'] if entry else None
+
+        if entry and age < config.SOURCE_CACHE_TTL:
+            self.hits += 1
+            return _copy(entry['results'])
+
+        if entry and age < config.SOURCE_CACHE_TTL + config.SOURCE_CACHE_STALE:
+            self.stale_hits += 1
+            if key not in self._inflight:
+                logger.info(f"♻️ {source}: отдаю кэш ({age / 60:.0f} мин), обновляю в фоне")
+                task = self._start_fetch(key, fetch)
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return _copy(entry['results'])
+
+        self.misses += 1
+        task = self._inflight.get(key) or self._start_fetch(key, fetch)
+        results = await asyncio.shield(task)
+        if not results and entry:
+            logger.info(f"♻️ {source}: источник ничего не вернул, отдаю старый кэш")
+            return _copy(entry['results'])
+        return _copy(results)
+
+    def put(self, source: str, query: str, params: Dict, results: List[Dict]):
+        """
+        Кладет результаты в кэш без запроса к источнику
+
+        Для ответов, которые покрывают сразу несколько запросов
+        (объединенный OR-запрос NewsAPI). На диск попадает при
+        ближайшем сохранении.
+        """
+        if not self._loaded:
+            self._load()
+        if results:
+            self.entries[_cache_key(source, query, params)] = {'stored_at': time.time(), 'results': _copy(results)}
+            self._evict()
+
+    def _start_fetch(self, key: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch_and_store(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        results = await fetch()
+        if results:
+            self.entries[key] = {'stored_at': time.time(), 'results': _copy(results)}
+            self._evict()
+            try:
+                # Снимок словаря: в потоке он не должен меняться из event loop
+                await asyncio.to_thread(self.save, dict(self.entries))
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось сохранить кэш источников: {e}")
+        return results
+
+    def _evict(self):
+        """Удаляет самые старые записи сверх SOURCE_CACHE_MAX_ENTRIES"""
+        excess = len(self.entries) - config.SOURCE_CACHE_MAX_ENTRIES
+        if excess > 0:
+            oldest = sorted(self.entries, key=lambda key: self.entries[key]['stored_at'])[:excess]
+            for key in oldest:
+                del self.entries[key]
+
+    def summary(self) -> str:
+        """Одна строка для /status"""
+        return (
+            f"Кэш поиска: {len(self.entries)} запросов, попаданий {self.hits}, "
+            f"устаревших {self.stale_hits}, промахов {self.misses}"
+        )
+
+
+# Общий кэш для всех экземпляров ContentFinder
+source_cache = SourceResultCache()
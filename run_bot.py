@@ -2,40 +2,70 @@
 🌙 ОРАКУЛ СНОВ - Главный файл запуска с командами
 Версия 2.0 - с управлением через Telegram
 """
+import argparse
 import asyncio
 import sys
 import logging
+from datetime import datetime
 from telegram.ext import Application, CommandHandler
 from bot import DreamOracleBot
-from scheduler import PostScheduler
+from scheduler import PostScheduler, describe_schedule
+from feed_crawler import feed_crawler
+from loop_monitor import loop_monitor
+from profiler import profile_window
 import commands
 import config
+from config_reload import config_reloader
+from logging_setup import setup_logging
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler('bot.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Настройка логирования: запись на диск и в консоль идет в отдельном потоке
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
-async def main():
+def parse_args():
+    """Аргументы командной строки"""
+    parser = argparse.ArgumentParser(description='Оракул Снов - бот автопостинга')
+    parser.add_argument(
+        '--profile', type=int, metavar='SECONDS',
+        help='снять профиль процесса после запуска и сохранить отчет в файл'
+    )
+    parser.add_argument(
+        '--profile-post', action='store_true',
+        help='выполнить в окне профилирования полный цикл создания поста'
+    )
+    return parser.parse_args()
+
+
+def _write_report(filename: str, report: str):
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(report)
+
+
+async def profile_to_file(seconds: int, bot: DreamOracleBot, with_post: bool):
+    """Снимает профиль и пишет отчет в файл"""
+    workload = bot.create_and_publish_post if with_post else None
+    try:
+        report = await profile_window(seconds, workload)
+    except Exception as e:
+        logger.error(f"❌ Ошибка профилирования: {e}", exc_info=True)
+        return
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    await asyncio.to_thread(_write_report, filename, report)
+    logger.info(f"📈 Отчет профилирования сохранен: {filename}")
+
+
+async def main(args=None):
     """Главная функция запуска бота с командами"""
     
-    print("\n" + "="*60)
-    print("🌙 ОРАКУЛ СНОВ - СИСТЕМА АВТОПОСТИНГА v2.0")
-    print("="*60)
+    logger.info("🌙 ОРАКУЛ СНОВ - СИСТЕМА АВТОПОСТИНГА v2.0")
     
     # Проверяем конфигурацию
     try:
         config.validate_config()
-        print("✅ Конфигурация корректна")
+        logger.info("✅ Конфигурация корректна")
     except ValueError as e:
-        print(f"❌ Ошибка конфигурации: {e}")
+        logger.error(f"❌ Ошибка конфигурации: {e}")
         return
     
     # Создаем экземпляры бота и планировщика
@@ -46,9 +76,9 @@ async def main():
     commands.set_bot_instance(bot, scheduler)
     
     # Проверяем подключение
-    print("\n🔍 Проверяю подключение...")
+    logger.info("🔍 Проверяю подключение...")
     if not await bot.test_connection():
-        print("❌ Не удалось подключиться к Telegram")
+        logger.error("❌ Не удалось подключиться к Telegram")
         return
     
     # Создаем приложение для обработки команд
@@ -60,69 +90,92 @@ async def main():
     application.add_handler(CommandHandler('post_custom', commands.post_custom_command))
     application.add_handler(CommandHandler('status', commands.status_command))
     application.add_handler(CommandHandler('next_post', commands.next_post_command))
+    application.add_handler(CommandHandler('search', commands.search_command))
+    application.add_handler(CommandHandler('profile', commands.profile_command))
+    application.add_handler(CommandHandler('reload', commands.reload_command))
     application.add_handler(CommandHandler('enable_auto', commands.enable_auto_command))
     application.add_handler(CommandHandler('disable_auto', commands.disable_auto_command))
     
-    print("\n✅ Команды управления зарегистрированы:")
-    print("   /start - информация о боте")
-    print("   /post_now - создать пост сейчас")
-    print("   /post_custom [тема] - создать пост на тему")
-    print("   /status - статус системы")
-    print("   /next_post - когда следующий пост")
-    print("   /enable_auto - включить автопостинг")
-    print("   /disable_auto - выключить автопостинг")
+    logger.info("✅ Команды управления зарегистрированы:")
+    logger.info("   /start - информация о боте")
+    logger.info("   /post_now - создать пост сейчас")
+    logger.info("   /post_custom [тема] - создать пост на тему")
+    logger.info("   /status - статус системы")
+    logger.info("   /next_post - когда следующий пост")
+    logger.info("   /search [запрос] - поиск по опубликованным постам")
+    logger.info("   /profile [секунды] [post] - профиль процесса")
+    logger.info("   /reload - перечитать настройки без рестарта")
+    logger.info("   /enable_auto - включить автопостинг")
+    logger.info("   /disable_auto - выключить автопостинг")
     
     # Автоматически запускаем автопостинг если включен в настройках
-    print("\n" + "="*60)
     if config.AUTO_POST_ENABLED:
         scheduler.start()
-        print(f"✅ Автопостинг запущен автоматически!")
-        print(f"⏰ Интервал: каждые {config.POST_INTERVAL_HOURS} часов")
-        print(f"📅 Следующий пост: {scheduler.get_next_run_time()}")
+        logger.info("✅ Автопостинг запущен автоматически!")
+        logger.info(f"⏰ Расписание: {describe_schedule()}")
+        logger.info(f"📅 Следующий пост: {scheduler.get_next_run_time()}")
     else:
-        print(f"ℹ️ Автопостинг выключен (AUTO_POST_ENABLED=false)")
-        print(f"💡 Для включения используйте команду /enable_auto")
+        logger.info("ℹ️ Автопостинг выключен (AUTO_POST_ENABLED=false)")
+        logger.info("💡 Для включения используйте команду /enable_auto")
+    
+    # Фоновый обход фидов: свежие записи готовы к моменту поста
+    if config.FEED_CRAWLER_ENABLED:
+        feed_crawler.start()
     
-    print("\n" + "="*60)
-    print("✅ БОТ ЗАПУЩЕН И ГОТОВ К РАБОТЕ!")
-    print("="*60)
-    print(f"\n📱 Канал: {config.CHANNEL_USERNAME}")
-    print(f"🤖 Управление: напишите боту /start в личку")
+    # Сторож event loop: ловит блокирующие вызовы в общем loop
+    if config.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    
+    # Горячая перезагрузка настроек: /reload и слежение за файлом
+    config_reloader.attach(scheduler)
+    if config.CONFIG_WATCH_ENABLED:
+        config_reloader.start()
+    
+    logger.info("✅ БОТ ЗАПУЩЕН И ГОТОВ К РАБОТЕ!")
+    logger.info(f"📱 Канал: {config.CHANNEL_USERNAME}")
+    logger.info("🤖 Управление: напишите боту /start в личку")
     
     if config.ADMIN_USER_ID == 0:
-        print("\n⚠️  ВНИМАНИЕ: ADMIN_USER_ID не установлен!")
-        print("   Для получения своего ID:")
-        print("   1. Напишите боту /start")
-        print("   2. Посмотрите в логи - там будет ваш ID")
-        print("   3. Добавьте его в .env файл")
+        logger.warning("⚠️  ВНИМАНИЕ: ADMIN_USER_ID не установлен!")
+        logger.info("   Для получения своего ID:")
+        logger.info("   1. Напишите боту /start")
+        logger.info("   2. Посмотрите в логи - там будет ваш ID")
+        logger.info("   3. Добавьте его в .env файл")
     
-    print("\n💡 Для остановки нажмите Ctrl+C")
-    print("="*60 + "\n")
+    logger.info("💡 Для остановки нажмите Ctrl+C")
     
     # Запускаем бота
     await application.initialize()
     await application.start()
     await application.updater.start_polling(drop_pending_updates=True)
     
+    # Профилирование запуска по флагу --profile
+    profile_task = None
+    if args and args.profile:
+        profile_task = asyncio.create_task(profile_to_file(args.profile, bot, args.profile_post))
+    
     try:
         # Держим бота запущенным
         while True:
             await asyncio.sleep(60)
     except KeyboardInterrupt:
-        print("\n\n⏹️ Получен сигнал остановки...")
+        logger.info("⏹️ Получен сигнал остановки...")
     finally:
         # Останавливаем всё
         if scheduler.is_running:
             scheduler.stop()
+        feed_crawler.stop()
+        loop_monitor.stop()
+        config_reloader.stop()
         await application.stop()
         await application.shutdown()
-        print("✅ Бот остановлен")
-        print("👋 До встречи!")
+        logger.info("✅ Бот остановлен")
+        logger.info("👋 До встречи!")
 
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_args()))
     except KeyboardInterrupt:
         print("\n👋 Программа остановлена пользователем")
     except Exception as e:
@@ -4,23 +4,64 @@
 """
 import asyncio
 import logging
+import math
+import time
+from collections import deque
 from datetime import datetime, timedelta
+from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 import pytz
 import config
 from bot import DreamOracleBot
+from config_reload import config_reloader
+from logging_setup import correlated, setup_logging
+from loop_monitor import loop_monitor
 
 logger = logging.getLogger(__name__)
 
+TIMEZONE = pytz.timezone('Europe/Moscow')
+
+# Сколько последних длительностей подготовки поста учитывать в p95
+DURATION_HISTORY = 20
+
+
+def describe_schedule() -> str:
+    """Расписание автопостинга для логов и сообщений бота"""
+    if config.POST_SLOTS:
+        return f"в {', '.join(config.POST_SLOTS)} (МСК)"
+    return f"каждые {config.POST_INTERVAL_HOURS} часов"
+
+
+def next_slot(after: datetime) -> datetime:
+    """Ближайший слот публикации строго позже after (aware datetime)"""
+    local = after.astimezone(TIMEZONE)
+    candidates = []
+    for day in (0, 1):
+        date = (local + timedelta(days=day)).date()
+        for slot in config.POST_SLOTS:
+            hours, minutes = (int(part) for part in slot.split(':'))
+            moment = TIMEZONE.localize(datetime(date.year, date.month, date.day, hours, minutes))
+            if moment > local:
+                candidates.append(moment)
+    return min(candidates)
+
 
 class PostScheduler:
     """Планировщик автоматических постов"""
     
     def __init__(self):
         self.bot = DreamOracleBot()
-        self.scheduler = AsyncIOScheduler(timezone=pytz.timezone('Europe/Moscow'))
+        self.scheduler = AsyncIOScheduler(timezone=TIMEZONE)
         self.is_running = False
+        # Длительности подготовки поста (поиск + генерация) для расчета упреждения
+        self.durations = deque(maxlen=DURATION_HISTORY)
+        self.next_slot: Optional[datetime] = None
+        # Слот, пост к которому сейчас готовится или ждет публикации
+        self.active_slot: Optional[datetime] = None
+        # Запас готовых постов (POST_PREFETCH_COUNT > 1): (время подготовки, пост)
+        self.ready = deque()
     
     async def scheduled_post(self):
         """Функция, которая вызывается по расписанию"""
@@ -30,6 +71,102 @@ class PostScheduler:
         except Exception as e:
             logger.error(f"❌ Ошибка в scheduled_post: {e}", exc_info=True)
     
+    def lead_seconds(self) -> float:
+        """
+        За сколько секунд до слота начинать подготовку поста
+        
+        p95 длительности последних запусков с запасом POST_LEAD_MARGIN;
+        пока истории нет - POST_LEAD_DEFAULT_SECONDS.
+        """
+        if not self.durations:
+            lead = config.POST_LEAD_DEFAULT_SECONDS
+        else:
+            ordered = sorted(self.durations)
+            p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+            lead = p95 * config.POST_LEAD_MARGIN
+        return max(config.POST_LEAD_MIN_SECONDS, min(config.POST_LEAD_MAX_SECONDS, lead))
+    
+    def _schedule_next_slot(self):
+        """Ставит задачу подготовки поста на (ближайший слот - упреждение)"""
+        lead = self.lead_seconds()
+        # Слот, до которого еще успеваем подготовить пост
+        after = datetime.now(TIMEZONE) + timedelta(seconds=lead)
+        if self.active_slot is not None and after < self.active_slot:
+            # Пост к active_slot уже готовится: второй задачи на тот же слот не ставим
+            after = self.active_slot
+        slot = next_slot(after)
+        self.next_slot = slot
+        self.scheduler.add_job(
+            self.slot_post,
+            trigger=DateTrigger(run_date=slot - timedelta(seconds=lead)),
+            args=[slot],
+            id='auto_post',
+            name='Автоматический постинг',
+            replace_existing=True,
+            # Запуск, пропущенный из-за занятого loop, все равно выполняем
+            misfire_grace_time=None
+        )
+        logger.info(
+            f"📅 Слот {slot.strftime('%d.%m.%Y %H:%M')}: подготовка начнется за {lead:.0f} с"
+        )
+    
+    async def _take_prepared(self) -> Optional[dict]:
+        """
+        Пост для слота: из запаса или подготовленный сейчас
+        
+        При POST_PREFETCH_COUNT > 1 пустой запас пополняется одним
+        батч-запросом к Groq; первый пост идет в текущий слот.
+        В историю длительностей попадает только реальная подготовка:
+        посты из запаса берутся мгновенно и занизили бы упреждение.
+        """
+        while self.ready:
+            prepared_at, prepared = self.ready.popleft()
+            if time.time() - prepared_at <= config.POST_PREFETCH_MAX_AGE_HOURS * 3600:
+                logger.info(f"📦 Беру пост из запаса, осталось {len(self.ready)}")
+                return prepared
+            logger.info("🗑️ Пост из запаса устарел, отбрасываю")
+        
+        started = time.monotonic()
+        prepared = None
+        if config.POST_PREFETCH_COUNT > 1:
+            batch = await self.bot.prepare_posts(config.POST_PREFETCH_COUNT)
+            if batch:
+                prepared = batch[0]
+                self.ready.extend((time.time(), post) for post in batch[1:])
+        if prepared is None:
+            prepared = await self.bot.prepare_post()
+        self.durations.append(time.monotonic() - started)
+        return prepared
+    
+    @correlated('post')
+    async def slot_post(self, slot: datetime):
+        """Готовит пост заранее и публикует его точно в слот"""
+        self.active_slot = slot
+        try:
+            logger.info(f"⏰ Готовлю пост к слоту {slot.strftime('%H:%M')}")
+            prepared = await self._take_prepared()
+            if not prepared:
+                return
+            
+            # Держим готовый пост до слота
+            delay = (slot - datetime.now(TIMEZONE)).total_seconds()
+            if delay > 0:
+                logger.info(f"⏳ Пост готов, публикация через {delay:.0f} с")
+                await asyncio.sleep(delay)
+            else:
+                logger.warning(f"⚠️ Пост подготовлен с опозданием на {-delay:.0f} с")
+            
+            await self.bot.publish_prepared(prepared)
+            lag = (datetime.now(TIMEZONE) - slot).total_seconds()
+            logger.info(f"📤 Отклонение от слота: {lag:+.2f} с")
+        except Exception as e:
+            logger.error(f"❌ Ошибка в slot_post: {e}", exc_info=True)
+        finally:
+            self.active_slot = None
+            # После горячей перезагрузки режим мог смениться на интервальный
+            if self.is_running and config.POST_SLOTS:
+                self._schedule_next_slot()
+    
     def start(self):
         """Запускает планировщик"""
         if self.is_running:
@@ -37,24 +174,52 @@ class PostScheduler:
             return
         
         # Добавляем задачу на автопостинг
+        if config.POST_SLOTS:
+            self._schedule_next_slot()
+        else:
+            self._schedule_interval()
+        
+        # Запускаем планировщик
+        self.scheduler.start()
+        self.is_running = True
+        
+        logger.info("✅ Планировщик запущен!")
+        logger.info(f"⏰ Расписание: {describe_schedule()}")
+        logger.info(f"📅 Следующий пост: {self.get_next_run_time()}")
+    
+    def _schedule_interval(self, start_date: Optional[datetime] = None):
+        """Ставит интервальную задачу автопостинга"""
+        self.next_slot = None
         self.scheduler.add_job(
             self.scheduled_post,
-            trigger=IntervalTrigger(hours=config.POST_INTERVAL_HOURS),
+            trigger=IntervalTrigger(hours=config.POST_INTERVAL_HOURS, start_date=start_date),
             id='auto_post',
             name='Автоматический постинг',
             replace_existing=True
         )
+    
+    def reschedule(self):
+        """
+        Перестраивает 'auto_post' под текущие настройки (после горячей перезагрузки)
         
-        # Запускаем планировщик
-        self.scheduler.start()
-        self.is_running = True
+        Интервальная задача сохраняет исходную точку отсчета, поэтому смена
+        POST_INTERVAL_HOURS не сдвигает расписание на момент перезагрузки.
+        """
+        if not self.is_running:
+            return
         
-        # Информация о следующем запуске
-        next_run = self.scheduler.get_job('auto_post').next_run_time
+        job = self.scheduler.get_job('auto_post')
+        if config.POST_SLOTS:
+            self._schedule_next_slot()
+        elif job and isinstance(job.trigger, IntervalTrigger):
+            self.scheduler.reschedule_job(
+                'auto_post',
+                trigger=IntervalTrigger(hours=config.POST_INTERVAL_HOURS, start_date=job.trigger.start_date)
+            )
+        else:
+            self._schedule_interval()
         
-        logger.info("✅ Планировщик запущен!")
-        logger.info(f"⏰ Интервал: каждые {config.POST_INTERVAL_HOURS} часов")
-        logger.info(f"📅 Следующий пост: {next_run.strftime('%d.%m.%Y %H:%M:%S')}")
+        logger.info(f"🔄 Расписание обновлено: {describe_schedule()}, следующий пост: {self.get_next_run_time()}")
     
     def stop(self):
         """Останавливает планировщик"""
@@ -70,6 +235,13 @@ class PostScheduler:
         if not self.is_running:
             return "Планировщик не запущен"
         
+        if self.active_slot:
+            # Пост уже готовится или ждет своего слота
+            return self.active_slot.strftime('%d.%m.%Y %H:%M:%S')
+        if config.POST_SLOTS and self.next_slot:
+            # Время публикации, а не начала подготовки
+            return self.next_slot.strftime('%d.%m.%Y %H:%M:%S')
+        
         job = self.scheduler.get_job('auto_post')
         if job:
             next_run = job.next_run_time
@@ -79,48 +251,48 @@ class PostScheduler:
 
 async def run_scheduler():
     """Запуск планировщика в бесконечном цикле"""
-    print("\n" + "="*60)
-    print("🌙 ОРАКУЛ СНОВ - АВТОПОСТИНГ ЗАПУЩЕН")
-    print("="*60)
+    logger.info("🌙 ОРАКУЛ СНОВ - АВТОПОСТИНГ ЗАПУЩЕН")
     
     # Проверяем конфигурацию
     try:
         config.validate_config()
     except ValueError as e:
-        print(f"❌ Ошибка конфигурации: {e}")
+        logger.error(f"❌ Ошибка конфигурации: {e}")
         return
     
     # Проверяем, включен ли автопостинг
     if not config.AUTO_POST_ENABLED:
-        print("⚠️ Автопостинг отключен в конфигурации!")
-        print("💡 Установите AUTO_POST_ENABLED=true в .env файле")
+        logger.warning("⚠️ Автопостинг отключен в конфигурации!")
+        logger.info("💡 Установите AUTO_POST_ENABLED=true в .env файле")
         return
     
     # Создаем планировщик
     scheduler = PostScheduler()
     
     # Тестируем подключение
-    print("\n🔍 Проверяю подключение...")
+    logger.info("🔍 Проверяю подключение...")
     if not await scheduler.bot.test_connection():
-        print("❌ Не удалось подключиться к Telegram")
+        logger.error("❌ Не удалось подключиться к Telegram")
         return
     
     # Запускаем планировщик
-    print("\n🚀 Запускаю планировщик...")
+    logger.info("🚀 Запускаю планировщик...")
     scheduler.start()
+    if config.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    config_reloader.attach(scheduler)
+    if config.CONFIG_WATCH_ENABLED:
+        config_reloader.start()
     
-    print("\n" + "="*60)
-    print("✅ СИСТЕМА РАБОТАЕТ!")
-    print("="*60)
-    print(f"📱 Канал: {config.CHANNEL_USERNAME}")
-    print(f"⏰ Интервал: каждые {config.POST_INTERVAL_HOURS} часов")
-    print(f"📅 Следующий пост: {scheduler.get_next_run_time()}")
-    print("\n💡 Нажмите Ctrl+C для остановки")
-    print("="*60)
+    logger.info("✅ СИСТЕМА РАБОТАЕТ!")
+    logger.info(f"📱 Канал: {config.CHANNEL_USERNAME}")
+    logger.info(f"⏰ Расписание: {describe_schedule()}")
+    logger.info(f"📅 Следующий пост: {scheduler.get_next_run_time()}")
+    logger.info("💡 Нажмите Ctrl+C для остановки")
     
     # Пропускаем создание первого поста для избежания проблем с кодировкой
-    print("\n⏳ Система в режиме ожидания...")
-    print("📅 Первый автоматический пост будет создан по расписанию")
+    logger.info("⏳ Система в режиме ожидания...")
+    logger.info("📅 Первый автоматический пост будет создан по расписанию")
     
     # Держим программу запущенной
     try:
@@ -129,15 +301,16 @@ async def run_scheduler():
             
             # Показываем статус каждый час
             if datetime.now().minute == 0:
-                print(f"\n⏰ {datetime.now().strftime('%H:%M')} - Система работает")
-                print(f"📅 Следующий пост: {scheduler.get_next_run_time()}")
+                logger.info(f"⏰ {datetime.now().strftime('%H:%M')} - Система работает")
+                logger.info(f"📅 Следующий пост: {scheduler.get_next_run_time()}")
                 
     except KeyboardInterrupt:
-        print("\n\n⏹️ Получен сигнал остановки...")
+        logger.info("⏹️ Получен сигнал остановки...")
         scheduler.stop()
-        print("✅ Планировщик остановлен")
-        print("👋 До встречи!")
+        logger.info("✅ Планировщик остановлен")
+        logger.info("👋 До встречи!")
 
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(run_scheduler())
\ No newline at end of file
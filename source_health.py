@@ -0,0 +1,154 @@
+"""
+Отслеживание здоровья источников контента
+EWMA задержки и доли ошибок, circuit breaker с пробными запросами
+"""
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# Состояния circuit breaker
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Вес нового наблюдения в экспоненциальном скользящем среднем
+EWMA_ALPHA = 0.3
+
+# Сколько последних задержек хранить для оценки хвоста распределения
+LATENCY_WINDOW = 50
+
+
+class SourceHealth:
+    """Статистика и состояние circuit breaker одного источника"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.latency_ewma: Optional[float] = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_success: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.opened_at = 0.0
+        self.open_seconds = config.CIRCUIT_OPEN_SECONDS
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+
+    def _observe(self, latency: float, failed: bool):
+        self.requests += 1
+        self.latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency_ewma
+        self.error_rate = EWMA_ALPHA * (1.0 if failed else 0.0) + (1 - EWMA_ALPHA) * self.error_rate
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Перцентиль задержки по последним запросам (None, если данных мало)"""
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    def allow(self) -> bool:
+        """Можно ли сейчас обращаться к источнику"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            # Время охлаждения вышло - пропускаем один пробный запрос
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # Пробный запрос, который так и не отчитался (например, был отменен), считаем потерянным
+            probe_lost = time.monotonic() - self.probe_started >= self.open_seconds
+            if not self.probe_in_flight or probe_lost:
+                self.probe_in_flight = True
+                self.probe_started = time.monotonic()
+                return True
+        return False
+
+    def record_success(self, latency: float):
+        """Регистрирует успешный запрос"""
+        self._observe(latency, failed=False)
+        self.consecutive_failures = 0
+        self.last_success = datetime.now()
+        self.probe_in_flight = False
+        if self.state != CLOSED:
+            logger.info(f"✅ Источник {self.name} восстановлен")
+        self.state = CLOSED
+        self.open_seconds = config.CIRCUIT_OPEN_SECONDS
+
+    def record_failure(self, latency: float, error: str = ''):
+        """Регистрирует неудачный запрос"""
+        self._observe(latency, failed=True)
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error[:200]
+
+        if self.state == HALF_OPEN:
+            # Пробный запрос не прошел - открываем снова с удвоенным охлаждением
+            self.open_seconds = min(self.open_seconds * 2, config.CIRCUIT_MAX_OPEN_SECONDS)
+            self._open()
+        elif self.state == CLOSED and self.consecutive_failures >= config.CIRCUIT_FAILURE_THRESHOLD:
+            self._open()
+        self.probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.info(f"🚫 Источник {self.name} отключен на {int(self.open_seconds)} с")
+
+    def summary(self) -> str:
+        """Строка для /status"""
+        icon = {CLOSED: '🟢', HALF_OPEN: '🟡', OPEN: '🔴'}[self.state]
+        latency = f"{self.latency_ewma:.1f} с" if self.latency_ewma is not None else '—'
+        last_success = self.last_success.strftime('%d.%m %H:%M') if self.last_success else 'никогда'
+        return (
+            f"{icon} {self.name}: {latency}, ошибки {self.error_rate:.0%}, "
+            f"успех {last_success}"
+        )
+
+
+class SourceHealthRegistry:
+    """Реестр здоровья всех источников"""
+
+    def __init__(self):
+        self.sources: Dict[str, SourceHealth] = {}
+
+    def get(self, name: str) -> SourceHealth:
+        if name not in self.sources:
+            self.sources[name] = SourceHealth(name)
+        return self.sources[name]
+
+    def allow(self, name: str) -> bool:
+        """Можно ли обращаться к источнику; печатает причину пропуска"""
+        allowed = self.get(name).allow()
+        if not allowed:
+            logger.info(f"⏭️ Пропускаю {name}: circuit breaker открыт")
+        return allowed
+
+    def record_success(self, name: str, latency: float):
+        self.get(name).record_success(latency)
+
+    def record_failure(self, name: str, latency: float, error: str = ''):
+        self.get(name).record_failure(latency, error)
+
+    def summary_lines(self, limit: int = 15) -> List[str]:
+        """Строки состояния источников: сначала проблемные, не больше limit"""
+        order = {OPEN: 0, HALF_OPEN: 1, CLOSED: 2}
+        ranked = sorted(self.sources.values(), key=lambda health: (order[health.state], -health.error_rate))
+        lines = [health.summary() for health in ranked[:limit]]
+        if len(ranked) > limit:
+            lines.append(f"… и еще {len(ranked) - limit}")
+        return lines
+
+
+# Общий реестр для всех экземпляров ContentFinder (бот и планировщик)
+health_registry = SourceHealthRegistry()
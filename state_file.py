@@ -0,0 +1,17 @@
+"""
+Сохранение файлов состояния (квота NewsAPI, кэш источников, реестр фидов)
+"""
+import os
+
+
+def write_atomic(path: str, text: str):
+    """
+    Записывает текст в файл атомарно: через временный файл и os.replace
+
+    При сбое посреди записи на диске остается прежняя версия файла,
+    а не обрезанный JSON, который не прочитается при следующем запуске.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
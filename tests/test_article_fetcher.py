@@ -0,0 +1,233 @@
+"""
+Тесты извлечения полного текста статей (article_fetcher)
+Страницы - локальные фикстуры, сеть подменяется httpx.MockTransport
+"""
+import asyncio
+from pathlib import Path
+import httpx
+import config
+from article_fetcher import ArticleFetcher, ArticleTextParser
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+ARTICLE_URL = 'https://example.com/lucid-dreams'
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding='utf-8')
+
+
+def extract(html: str, max_chars: int = 5000, chunk_size: int = 0) -> str:
+    """Текст страницы; chunk_size > 0 - подача кусками, как при потоковой загрузке"""
+    parser = ArticleTextParser(max_chars)
+    if chunk_size:
+        for start in range(0, len(html), chunk_size):
+            parser.feed(html[start:start + chunk_size])
+    else:
+        parser.feed(html)
+    parser.close()
+    return parser.get_text()
+
+
+def html_response(body, status_code: int = 200, content_type: str = 'text/html; charset=utf-8') -> httpx.Response:
+    return httpx.Response(status_code, headers={'content-type': content_type}, content=body)
+
+
+def fetch(fetcher: ArticleFetcher, handler, url: str = ARTICLE_URL) -> str:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await fetcher.fetch_text(url, client)
+    return asyncio.run(run())
+
+
+# Разбор HTML
+
+def test_article_text_is_preferred_over_page_chrome():
+    text = extract(load_fixture('article.html'))
+
+    assert text.split('\n\n') == [
+        'New Study Reveals Brain Activity During Lucid Dreams',
+        'Scientists discovered increased activity in the prefrontal cortex during lucid dreaming.',
+        'Participants who reported frequent lucid dreams showed more gray matter in frontopolar areas.',
+        'The researchers say the findings may help explain how the dreaming brain monitors itself & its own state.',
+    ]
+
+
+def test_scripts_styles_and_navigation_are_stripped():
+    text = extract(load_fixture('article.html'))
+
+    for junk in ('script', 'stylesheet', 'navigation', 'Related:', 'Copyright', 'daily dose'):
+        assert junk not in text
+
+
+def test_main_element_is_used_like_article():
+    text = extract(load_fixture('main.html'))
+
+    assert text.startswith('Что такое сонный паралич')
+    assert 'фазы REM' in text
+    assert 'рассылку' not in text
+
+
+def test_short_paragraphs_are_dropped():
+    text = extract(load_fixture('main.html'))
+
+    assert 'Ok' not in text.split('\n\n')
+    assert 'Share' not in extract(load_fixture('article.html'))
+
+
+def test_page_without_article_falls_back_to_body_paragraphs():
+    text = extract(load_fixture('boilerplate.html'))
+
+    assert text.split('\n\n') == [
+        'Keeping a dream journal by the bed is the simplest way to remember more of your dreams.',
+        'Write down whatever you recall right after waking, before checking your phone or getting up.',
+    ]
+
+
+def test_chunked_feed_gives_the_same_text():
+    html = load_fixture('article.html')
+
+    assert extract(html, chunk_size=7) == extract(html)
+
+
+def test_text_is_capped_at_max_chars():
+    parser = ArticleTextParser(max_chars=60)
+    parser.feed(load_fixture('article.html'))
+    parser.close()
+
+    assert len(parser.get_text()) == 60
+    assert parser.is_complete
+
+
+def test_page_without_paragraphs_gives_empty_text():
+    assert extract('<html><body><div>Only a div</div><p>Tiny</p></body></html>') == ''
+
+
+# Загрузка
+
+def test_fetch_text_downloads_and_caches_article():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url)
+        return html_response(load_fixture('article.html').encode('utf-8'))
+
+    fetcher = ArticleFetcher()
+    first = fetch(fetcher, handler)
+    second = fetch(fetcher, handler)
+
+    assert first.startswith('New Study Reveals Brain Activity')
+    assert second == first
+    assert len(requests) == 1
+
+
+def test_non_html_response_gives_empty_text():
+    fetcher = ArticleFetcher()
+
+    text = fetch(fetcher, lambda request: html_response(b'%PDF-1.4', content_type='application/pdf'))
+
+    assert text == ''
+
+
+def test_http_error_is_cached_as_empty_text():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url)
+        return html_response(b'<html><body><p>Not found</p></body></html>', status_code=404)
+
+    fetcher = ArticleFetcher()
+
+    assert fetch(fetcher, handler) == ''
+    assert fetch(fetcher, handler) == ''
+    assert len(requests) == 1
+
+
+def test_invalid_url_is_not_requested():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError(f"unexpected request to {request.url}")
+
+    fetcher = ArticleFetcher()
+
+    assert fetch(fetcher, handler, url='') == ''
+    assert fetch(fetcher, handler, url='ftp://example.com/article') == ''
+
+
+def test_download_stops_at_byte_cap():
+    sent = []
+
+    async def body():
+        # Мегабайт разметки без абзацев, статья - только в самом конце
+        for _ in range(256):
+            chunk = b'<div>' + b'x' * 4090 + b'</div>'
+            sent.append(len(chunk))
+            yield chunk
+        yield load_fixture('article.html').encode('utf-8')
+
+    fetcher = ArticleFetcher()
+    fetcher.max_bytes = 64 * 1024
+
+    text = fetch(fetcher, lambda request: html_response(body()))
+
+    assert text == ''
+    assert sum(sent) < 128 * 1024
+
+
+def test_slow_page_times_out():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return html_response(load_fixture('article.html').encode('utf-8'))
+
+    fetcher = ArticleFetcher()
+    fetcher.timeout = 0.05
+
+    assert fetch(fetcher, handler) == ''
+
+
+def enrich(fetcher: ArticleFetcher, handler, candidates: list) -> list:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await fetcher.enrich(candidates, client)
+    return asyncio.run(run())
+
+
+def test_enrich_replaces_only_shorter_content():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url))
+        return html_response(load_fixture('article.html').encode('utf-8'))
+
+    long_content = 'x' * 10000
+    candidates = [
+        {'url': ARTICLE_URL, 'description': 'Teaser'},
+        {'url': 'https://example.com/long', 'content': long_content},
+    ]
+
+    enriched = enrich(ArticleFetcher(), handler, candidates)
+
+    assert enriched is candidates
+    assert enriched[0]['content'].startswith('New Study Reveals Brain Activity')
+    assert enriched[1]['content'] == long_content
+    assert sorted(requests) == sorted(candidate['url'] for candidate in candidates)
+
+
+def test_enrich_limits_concurrent_downloads(monkeypatch):
+    monkeypatch.setattr(config, 'ARTICLE_FETCH_CONCURRENCY', 2)
+    in_flight = []
+    peak = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight.append(request.url)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(request.url)
+        return html_response(load_fixture('article.html').encode('utf-8'))
+
+    candidates = [{'url': f'https://example.com/article-{index}'} for index in range(6)]
+
+    enriched = enrich(ArticleFetcher(), handler, candidates)
+
+    assert all(candidate['content'].startswith('New Study') for candidate in enriched)
+    assert len(peak) == 6
+    assert max(peak) == 2
@@ -0,0 +1,177 @@
+"""
+Локальная оценка токенов и учет расхода токенов Groq
+Без внешних токенизаторов: эвристика для русского и английского текста
+"""
+import math
+import re
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Примерное число символов на токен для токенизатора Llama 3
+LATIN_CHARS_PER_TOKEN = 4.0
+CYRILLIC_CHARS_PER_TOKEN = 2.7
+DIGITS_PER_TOKEN = 3.0
+
+# Служебные токены на каждое сообщение чата (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_PIECE_RE = re.compile(r'[A-Za-z]+|[А-Яа-яЁё]+|\d+|\S')
+_SENTENCE_END_RE = re.compile(r'[.!?…](?:["»)\]]*)(?=\s|$)')
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценивает количество токенов в тексте"""
+    if not text:
+        return 0
+
+    tokens = 0.0
+    for piece in _PIECE_RE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += math.ceil(len(piece) / LATIN_CHARS_PER_TOKEN)
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / DIGITS_PER_TOKEN)
+        elif first.isalpha():
+            tokens += math.ceil(len(piece) / CYRILLIC_CHARS_PER_TOKEN)
+        elif ord(first) > 0xFFFF:
+            # Эмодзи обычно кодируются несколькими байтовыми токенами
+            tokens += 2
+        else:
+            tokens += 1
+    return int(tokens)
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    """Оценивает размер списка сообщений chat.completions в токенах"""
+    return sum(
+        estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Обрезает текст до бюджета токенов по границе предложения
+
+    Если в бюджет не помещается ни одно предложение целиком,
+    текст обрезается по границе слова с многоточием.
+    """
+    if not text or max_tokens <= 0:
+        return ''
+
+    text = text.strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Ищем самую длинную цепочку целых предложений в пределах бюджета
+    best_end = 0
+    used = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        end = match.end()
+        used += estimate_tokens(text[best_end:end])
+        if used > max_tokens:
+            break
+        best_end = end
+
+    if best_end:
+        return text[:best_end].strip()
+
+    # Ни одно предложение не помещается - режем по словам
+    words = text.split()
+    result = []
+    used = 0
+    for word in words:
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens - 1:
+            break
+        result.append(word)
+        used += cost
+    return ' '.join(result) + '…' if result else ''
+
+
+class TokenUsageTracker:
+    """Учет расхода токенов по постам и по дням"""
+
+    def __init__(self, history_size: int = 100):
+        self.daily: Dict[str, Dict[str, int]] = {}
+        self.posts = deque(maxlen=history_size)
+
+    def record(self, prompt_tokens: int, completion_tokens: int, label: str = '',
+               estimated_prompt_tokens: Optional[int] = None, model: str = '') -> Dict:
+        """
+        Записывает расход токенов одного запроса
+
+        Returns:
+            Запись о расходе для этого поста
+        """
+        day = datetime.now().strftime('%Y-%m-%d')
+        stats = self.daily.setdefault(day, {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+        })
+        stats['requests'] += 1
+        stats['prompt_tokens'] += prompt_tokens
+        stats['completion_tokens'] += completion_tokens
+
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'label': label,
+            'model': model,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'estimated_prompt_tokens': estimated_prompt_tokens,
+        }
+        self.posts.append(entry)
+        return entry
+
+    def record_response(self, response, label: str = '',
+                        estimated_prompt_tokens: Optional[int] = None, model: str = '') -> Optional[Dict]:
+        """Записывает расход из поля usage ответа Groq (если оно есть)"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return None
+        return self.record(
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+            label=label,
+            estimated_prompt_tokens=estimated_prompt_tokens,
+            model=model
+        )
+
+    def today(self) -> Dict[str, int]:
+        """Возвращает статистику за текущий день"""
+        day = datetime.now().strftime('%Y-%m-%d')
+        return self.daily.get(day, {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+        })
+
+    def estimate_error(self) -> Optional[float]:
+        """Средняя относительная ошибка локальной оценки промпта"""
+        errors = [
+            abs(entry['estimated_prompt_tokens'] - entry['prompt_tokens']) / entry['prompt_tokens']
+            for entry in self.posts
+            if entry['estimated_prompt_tokens'] and entry['prompt_tokens']
+        ]
+        if not errors:
+            return None
+        return sum(errors) / len(errors)
+
+
+# Тестирование модуля
+if __name__ == '__main__':
+    samples = [
+        'Research shows that lucid dreamers have more gray matter in their frontopolar cortex.',
+        'Исследования показывают, что у людей с осознанными снами больше серого вещества.',
+        '🌙 Сны - это окно в подсознание ✨',
+    ]
+    for sample in samples:
+        print(f"{estimate_tokens(sample):4d} токенов | {len(sample):4d} символов | {sample}")
+
+    long_text = ' '.join(samples * 20)
+    truncated = truncate_to_tokens(long_text, 60)
+    print(f"\nОбрезка до 60 токенов: {estimate_tokens(truncated)} токенов")
+    print(truncated)